@@ -4,10 +4,16 @@ import matplotlib.pyplot as plt
 from queue import PriorityQueue
 import time
 
-start_time =time.time()
-def a_star(graph, start, end):
+def a_star(graph, start, end, profiler=None):
+    """A* sobre um grafo em lista de adjacências.
+
+    `profiler` (instrumentacao.Profiler) regista nós expandidos, arestas relaxadas e
+    inserções no heap; com None a instrumentação fica desligada.
+    """
     if start not in graph or end not in graph:
         return [], float('inf')
+    if profiler:
+        t = profiler.start()
 
     open_set = PriorityQueue()
     open_set.put((0, start))
@@ -17,16 +23,28 @@ def a_star(graph, start, end):
     f_score = {node: float('inf') for node in graph}
     f_score[start] = heuristic(start, end)
     open_set_hash = {start}
+    if profiler:
+        profiler.count("heap_pushes")
+        t = profiler.lap("init", t)
 
     while not open_set.empty():
         _, current = open_set.get()
         open_set_hash.remove(current)
+        if profiler:
+            profiler.count("nodes_expanded")
 
         if current == end:
+            if profiler:
+                t = profiler.lap("search", t)
             path = reconstruct_path(came_from, end)
+            if profiler:
+                profiler.lap("reconstruct", t)
+                profiler.finish()
             return path, g_score[end]
 
         for neighbor, cost in graph[current]:
+            if profiler:
+                profiler.count("edges_relaxed")
             temp_g_score = g_score[current] + cost
 
             if temp_g_score < g_score[neighbor]:
@@ -37,7 +55,12 @@ def a_star(graph, start, end):
                 if neighbor not in open_set_hash:
                     open_set.put((f_score[neighbor], neighbor))
                     open_set_hash.add(neighbor)
+                    if profiler:
+                        profiler.count("heap_pushes")
 
+    if profiler:
+        profiler.lap("search", t)
+        profiler.finish()
     return [], float('inf')
 
 def heuristic(node, end):
@@ -54,27 +77,41 @@ def reconstruct_path(came_from, end):
     path.reverse()
     return path
 
-def desenhar_grafo(graph, path=None):
-    """Desenha o grafo e destaca o caminho encontrado."""
+def desenhar_grafo(graph, path=None, pos=None, max_labels=60, output_file=None):
+    """Desenha o grafo e destaca o caminho encontrado.
+
+    Grafos com mais de `max_labels` arestas são desenhados sem rótulos. `pos` permite
+    reutilizar um layout já calculado (é devolvido no fim) e `output_file` grava a
+    figura em ficheiro sem abrir janela.
+    """
     G = nx.Graph()
     for node, neighbors in graph.items():
         for neighbor, weight in neighbors:
             G.add_edge(node, neighbor, weight=weight)
 
-    pos = nx.spring_layout(G)
-    plt.figure(figsize=(8, 6))
+    if pos is None:
+        pos = nx.spring_layout(G, seed=42, iterations=50 if len(G) <= 500 else 15)
+    fig = plt.figure(figsize=(8, 6))
 
-    nx.draw(G, pos, with_labels=True, node_size=700, node_color="lightblue", font_size=10, edge_color="gray")
-    labels = nx.get_edge_attributes(G, 'weight')
-    nx.draw_networkx_edge_labels(G, pos, edge_labels=labels)
+    show_labels = G.number_of_edges() <= max_labels
+    nx.draw(G, pos, with_labels=show_labels, node_size=700 if show_labels else 30, node_color="lightblue",
+            font_size=10, edge_color="gray")
+    if show_labels:
+        labels = nx.get_edge_attributes(G, 'weight')
+        nx.draw_networkx_edge_labels(G, pos, edge_labels=labels)
 
     if path:
         path_edges = list(zip(path, path[1:]))
         nx.draw_networkx_edges(G, pos, edgelist=path_edges, edge_color="red", width=2)
-        nx.draw_networkx_nodes(G, pos, nodelist=path, node_size=800, node_color="orange")
+        nx.draw_networkx_nodes(G, pos, nodelist=path, node_size=800 if show_labels else 60, node_color="orange")
 
     plt.title("Grafo e Caminho Encontrado")
-    plt.show()
+    if output_file:
+        fig.savefig(output_file)
+        plt.close(fig)
+    else:
+        plt.show()
+    return pos
 
 # Grafo de exemplo
 graph = {
@@ -88,26 +125,29 @@ graph = {
     'H': [('G', 2), ('E', 5), ('C', 10)],
 }
 
-# Perguntar ao usuário a origem e destino
-start = input("Digite o nó de origem: ").strip()
-end = input("Digite o nó de destino: ").strip()
+if __name__ == "__main__":
+    start_time = time.time()
 
-# Verificar se ambos os nós estão no grafo
-if start not in graph or end not in graph:
-    print("Erro: Um ou ambos nós não existem no grafo.")
-else:
-    # Executar o algoritmo A*
-    path, cost = a_star(graph, start, end)
+    # Perguntar ao usuário a origem e destino
+    start = input("Digite o nó de origem: ").strip()
+    end = input("Digite o nó de destino: ").strip()
 
-    if path:
-        print("\nCaminho encontrado:", " -> ".join(path))
-        print("Custo total:", cost)
+    # Verificar se ambos os nós estão no grafo
+    if start not in graph or end not in graph:
+        print("Erro: Um ou ambos nós não existem no grafo.")
     else:
-        print("\nNão foi possível encontrar um caminho entre", start, "e", end)
+        # Executar o algoritmo A*
+        path, cost = a_star(graph, start, end)
+
+        if path:
+            print("\nCaminho encontrado:", " -> ".join(path))
+            print("Custo total:", cost)
+        else:
+            print("\nNão foi possível encontrar um caminho entre", start, "e", end)
 
-    # Exibir o grafo
-    desenhar_grafo(graph, path)
+        # Exibir o grafo
+        desenhar_grafo(graph, path)
 
-    end_time=time.time()
-    execution_time = end_time - start_time
-    print(f"Tempo de execução: {execution_time: .4f} segundos")
\ No newline at end of file
+        end_time=time.time()
+        execution_time = end_time - start_time
+        print(f"Tempo de execução: {execution_time: .4f} segundos")
\ No newline at end of file
@@ -0,0 +1,80 @@
+import argparse
+import time
+import numpy as np
+
+from rrt_asterisco_adaptado import rrt_star, load_csv, find_node_case_insensitive
+from obstaculos import load_collision_checker
+from cache_arvores import TreeCache, bounds_for_nodes, tree_key
+from instrumentacao import Profiler
+
+
+### === BENCHMARK: RRT* COM E SEM REUTILIZAÇÃO DA ÁRVORE DA MESMA ORIGEM === ###
+#
+# Faz as mesmas consultas (uma origem, vários destinos) duas vezes: com uma árvore nova por
+# consulta e com a árvore da origem guardada em cache, como o RRTStarApp com "Reutilizar
+# árvore da mesma origem". Mostra iterações, tempo, custo e tamanho da árvore por consulta.
+
+def executar(start, goal, collision_checker, cache=None, bounds=None, max_iter=500):
+    profiler = Profiler()
+    inicio = time.perf_counter()
+    if cache is None:
+        path, tree, _, _ = rrt_star(start, goal, max_iter=max_iter, collision_checker=collision_checker,
+                                    profiler=profiler, max_nodes=5000)
+    else:
+        key = tree_key("rrt_star", start, bounds, 1.0)
+        path, tree, _, _ = rrt_star(start, goal, max_iter=max_iter, collision_checker=collision_checker,
+                                    profiler=profiler, tree=cache.get(key), bounds=bounds, max_nodes=5000,
+                                    patience=50, shared_tree=True)
+        cache.put(key, tree)
+    decorrido = time.perf_counter() - inicio
+    custo = path[-1].cost if path else float('inf')
+    return profiler.counters.get("iterations", 0), decorrido, custo, len(tree)
+
+
+def linha(i, destino, resultado):
+    iteracoes, decorrido, custo, nos = resultado
+    custo_texto = f"{custo:.2f}" if custo != float('inf') else "-"
+    return f"{i:>3}  {destino:<12} {iteracoes:>6} {decorrido:>9.3f} {custo_texto:>9} {nos:>6}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara RRT* com e sem reutilização da árvore da mesma origem.")
+    parser.add_argument("arquivo", nargs="?", default="grafo.csv", help="CSV de nós (como nas interfaces)")
+    parser.add_argument("--origem", help="nó de origem (por omissão o primeiro do CSV)")
+    parser.add_argument("--consultas", type=int, default=10)
+    parser.add_argument("--max-iter", type=int, default=500)
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+
+    nodes, name_map = load_csv(args.arquivo)
+    if not nodes:
+        parser.error(f"Não foi possível ler nós de {args.arquivo}")
+    origem = args.origem or next(iter(nodes))
+    start = find_node_case_insensitive(nodes, name_map, origem)
+    if not start:
+        parser.error(f"Nó de origem inexistente: {origem}")
+
+    collision_checker = load_collision_checker(args.arquivo)
+    bounds = bounds_for_nodes(nodes.values())
+    rng = np.random.default_rng(args.semente)
+    candidatos = [nome for nome in nodes if nodes[nome] != start]
+    destinos = [candidatos[i] for i in rng.integers(0, len(candidatos), size=args.consultas)]
+
+    cache = TreeCache()
+    totais = {"nova": [0, 0.0], "reutilizada": [0, 0.0]}
+    cabecalho = f"{'#':>3}  {'destino':<12} {'iter.':>6} {'tempo (s)':>9} {'custo':>9} {'nós':>6}"
+    for modo in ("nova", "reutilizada"):
+        np.random.seed(args.semente)
+        print(f"\nÁrvore {modo} (origem {origem}):")
+        print(cabecalho)
+        for i, destino in enumerate(destinos, 1):
+            goal = nodes[destino]
+            resultado = executar(start, goal, collision_checker, cache if modo == "reutilizada" else None,
+                                 bounds, args.max_iter)
+            totais[modo][0] += resultado[0]
+            totais[modo][1] += resultado[1]
+            print(linha(i, destino, resultado))
+
+    print()
+    for modo, (iteracoes, decorrido) in totais.items():
+        print(f"Total com árvore {modo}: {iteracoes} iterações, {decorrido:.3f} s")
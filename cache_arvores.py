@@ -0,0 +1,45 @@
+from collections import OrderedDict
+
+
+### === CACHE LRU DE ÁRVORES RRT/RRT* POR ORIGEM === ###
+
+def bounds_for_nodes(coords, margin=50):
+    # Limites de amostragem fixos (todos os nós carregados + margem), para que a mesma
+    # árvore sirva qualquer destino a partir da mesma origem
+    coords = list(coords)
+    return tuple(
+        (min(c[i] for c in coords) - margin, max(c[i] for c in coords) + margin)
+        for i in range(3)
+    )
+
+def tree_key(planner, start, bounds, step_size):
+    return (planner, tuple(start), tuple(map(tuple, bounds)), step_size)
+
+
+class TreeCache:
+    def __init__(self, capacity=8):
+        self.capacity = capacity
+        self.trees = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        tree = self.trees.get(key)
+        if tree is None:
+            self.misses += 1
+            return None
+        self.trees.move_to_end(key)
+        self.hits += 1
+        return tree
+
+    def put(self, key, tree):
+        self.trees[key] = tree
+        self.trees.move_to_end(key)
+        while len(self.trees) > self.capacity:
+            self.trees.popitem(last=False)
+
+    def clear(self):
+        self.trees.clear()
+
+    def __len__(self):
+        return len(self.trees)
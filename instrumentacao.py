@@ -0,0 +1,60 @@
+import json
+from time import perf_counter_ns
+
+
+### === INSTRUMENTAÇÃO DOS ALGORITMOS (TEMPOS POR FASE E CONTADORES) === ###
+
+class Profiler:
+    # Os algoritmos recebem profiler=None por omissão e só chamam estes métodos
+    # dentro de "if profiler:", por isso o custo com a instrumentação desligada é
+    # apenas um teste de None por fase.
+
+    def __init__(self, name=None, callback=None):
+        self.name = name
+        self.callback = callback
+        self.timers = {}
+        self.counters = {}
+
+    def start(self):
+        return perf_counter_ns()
+
+    def lap(self, phase, t0):
+        # Acumula o tempo desde t0 na fase indicada e devolve o novo instante
+        now = perf_counter_ns()
+        self.timers[phase] = self.timers.get(phase, 0) + (now - t0)
+        return now
+
+    def count(self, counter, n=1):
+        self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def reset(self):
+        self.timers.clear()
+        self.counters.clear()
+
+    def total_ns(self):
+        return sum(self.timers.values())
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "timers_ns": dict(self.timers),
+            "counters": dict(self.counters),
+            "total_ns": self.total_ns()
+        }
+
+    def export_json(self, filename):
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+    def finish(self):
+        if self.callback:
+            self.callback(self.to_dict())
+
+    def stats(self):
+        total = self.total_ns() or 1
+        lines = ["Perfil de execução:"]
+        for phase, ns in sorted(self.timers.items(), key=lambda item: -item[1]):
+            lines.append(f" - {phase}: {ns / 1e6:.3f} ms ({100.0 * ns / total:.1f}%)")
+        for counter, value in sorted(self.counters.items()):
+            lines.append(f" - {counter}: {value}")
+        return lines
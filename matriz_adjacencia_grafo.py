@@ -1,6 +1,7 @@
 import pandas as pd
 import networkx as nx
 import math
+import heapq
 import sys
 import os
 import unidecode
@@ -88,33 +89,354 @@ def distancia_euclidiana(a, b, coordenadas):
     
     return math.sqrt((x_b - x_a)**2 + (y_b - y_a)**2)
 
-def a_star_melhor_caminho(grafo, origem, destino, coordenadas=None):
+def detalhes_caminho(grafo, caminho):
+    detalhes = []
+    for i in range(len(caminho) - 1):
+        origem_i, destino_i = caminho[i], caminho[i+1]
+        aresta = grafo.edges[origem_i, destino_i]
+        detalhes.append({
+            'origem': origem_i,
+            'destino': destino_i,
+            'distancia': aresta['distancia'],
+            'combustivel': aresta['combustivel'],
+            'portagem': aresta['portagem'],
+            'custo': aresta['weight']
+        })
+    return detalhes
+
+def totais_caminho(detalhes):
+    return {criterio: sum(d[criterio] for d in detalhes) for criterio in ('distancia', 'combustivel', 'portagem')}
+
+def a_star_melhor_caminho(grafo, origem, destino, coordenadas=None, profiler=None):
+    # profiler: instrumentacao.Profiler; o heap do A* é interno ao networkx, por isso
+    # conta-se avaliações da heurística em vez de inserções no heap
+    if profiler:
+        t = profiler.start()
+
     if coordenadas:
         heuristic = lambda a, b: distancia_euclidiana(a, b, coordenadas)
+        if profiler:
+            heuristic_base = heuristic
+            def heuristic(a, b):
+                profiler.count("heuristic_calls")
+                return heuristic_base(a, b)
     else:
         heuristic = None 
         
     try:
         caminho = nx.astar_path(grafo, origem, destino, heuristic=heuristic, weight='weight')
+        if profiler:
+            t = profiler.lap("search", t)
         custo_total = nx.path_weight(grafo, caminho, weight='weight')
-        
-        detalhes = []
-        for i in range(len(caminho) - 1):
-            origem_i, destino_i = caminho[i], caminho[i+1]
-            aresta = grafo.edges[origem_i, destino_i]
-            detalhes.append({
-                'origem': origem_i,
-                'destino': destino_i,
-                'distancia': aresta['distancia'],
-                'combustivel': aresta['combustivel'],
-                'portagem': aresta['portagem'],
-                'custo': aresta['weight']
-            })
-            
+        detalhes = detalhes_caminho(grafo, caminho)
+
+        if profiler:
+            profiler.lap("details", t)
+            profiler.count("path_nodes", len(caminho))
+            profiler.finish()
         return caminho, custo_total, detalhes
     except nx.NetworkXNoPath:
+        if profiler:
+            profiler.lap("search", t)
+            profiler.finish()
         return None, None, None
 
+def k_melhores_caminhos(grafo, origem, destino, k=3, profiler=None):
+    # Algoritmo de Yen com duas otimizações:
+    #  - uma única árvore de caminhos mínimos para o destino (Dijkstra no grafo invertido) dá a
+    #    heurística exata h(n) = distância até ao destino para todas as pesquisas de desvio;
+    #    se o caminho da árvore a partir do nó de desvio não usa nós/arestas removidos, é ótimo
+    #    e dispensa a pesquisa;
+    #  - os desvios já calculados ficam em cache pela combinação (nó, nós removidos, arestas removidas).
+    # Devolve até k rotas sem ciclos, por ordem de custo, cada uma com totais por critério.
+    if origem not in grafo or destino not in grafo:
+        return []
+
+    dist_destino, caminhos_arvore = nx.single_source_dijkstra(grafo.reverse(copy=False), destino, weight='weight')
+    if origem not in dist_destino:
+        return []
+
+    def caminho_arvore(no):
+        return caminhos_arvore[no][::-1]
+
+    def custo_caminho(caminho):
+        return sum(grafo.edges[caminho[i], caminho[i+1]]['weight'] for i in range(len(caminho) - 1))
+
+    def desvio(no, nos_removidos, arestas_removidas):
+        # A* a partir de `no` até ao destino, evitando os nós/arestas removidos
+        candidato = caminho_arvore(no)
+        if not nos_removidos.intersection(candidato) and not any(
+                (candidato[i], candidato[i+1]) in arestas_removidas for i in range(len(candidato) - 1)):
+            if profiler:
+                profiler.count("spt_shortcuts")
+            return candidato, dist_destino[no]
+
+        if profiler:
+            profiler.count("spur_searches")
+        g_score = {no: 0.0}
+        anterior = {}
+        fila = [(dist_destino[no], no)]
+        fechados = set()
+        while fila:
+            _, atual = heapq.heappop(fila)
+            if atual in fechados:
+                continue
+            fechados.add(atual)
+            if profiler:
+                profiler.count("nodes_expanded")
+            if atual == destino:
+                caminho = [atual]
+                while atual in anterior:
+                    atual = anterior[atual]
+                    caminho.append(atual)
+                return caminho[::-1], g_score[destino]
+            for vizinho, aresta in grafo[atual].items():
+                if vizinho in nos_removidos or (atual, vizinho) in arestas_removidas or vizinho not in dist_destino:
+                    continue
+                tentativo = g_score[atual] + aresta['weight']
+                if tentativo < g_score.get(vizinho, float('inf')):
+                    g_score[vizinho] = tentativo
+                    anterior[vizinho] = atual
+                    heapq.heappush(fila, (tentativo + dist_destino[vizinho], vizinho))
+        return None, None
+
+    melhores = [(dist_destino[origem], caminho_arvore(origem))]
+    candidatos = []
+    vistos = {tuple(melhores[0][1])}
+    cache_desvios = {}
+
+    while len(melhores) < k:
+        _, anterior_caminho = melhores[-1]
+        for i in range(len(anterior_caminho) - 1):
+            no_desvio = anterior_caminho[i]
+            raiz = anterior_caminho[:i + 1]
+            arestas_removidas = frozenset(
+                (caminho[i], caminho[i + 1]) for _, caminho in melhores
+                if len(caminho) > i + 1 and caminho[:i + 1] == raiz
+            )
+            nos_removidos = frozenset(raiz[:-1])
+
+            chave = (no_desvio, nos_removidos, arestas_removidas)
+            if chave in cache_desvios:
+                if profiler:
+                    profiler.count("cache_hits")
+                caminho_desvio, custo_desvio = cache_desvios[chave]
+            else:
+                caminho_desvio, custo_desvio = desvio(no_desvio, nos_removidos, arestas_removidas)
+                cache_desvios[chave] = (caminho_desvio, custo_desvio)
+            if caminho_desvio is None:
+                continue
+
+            caminho_total = raiz[:-1] + caminho_desvio
+            if tuple(caminho_total) not in vistos:
+                vistos.add(tuple(caminho_total))
+                heapq.heappush(candidatos, (custo_caminho(raiz) + custo_desvio, caminho_total))
+
+        if not candidatos:
+            break
+        melhores.append(heapq.heappop(candidatos))
+
+    rotas = []
+    for custo_total, caminho in melhores:
+        detalhes = detalhes_caminho(grafo, caminho)
+        rotas.append({
+            'caminho': caminho,
+            'custo': custo_total,
+            'detalhes': detalhes,
+            'totais': totais_caminho(detalhes)
+        })
+    return rotas
+
+def alcance_com_orcamento(grafo, origem, orcamento, criterio='weight'):
+    # Dijkstra de um-para-todos limitado: devolve todos os nós alcançáveis a partir da origem
+    # com custo acumulado <= orcamento no critério escolhido ('weight', 'distancia',
+    # 'combustivel' ou 'portagem'), com os custos e a árvore de predecessores.
+    # A pesquisa termina assim que o próximo nó da fila ultrapassa o orçamento.
+    if origem not in grafo:
+        return {}, {}
+
+    custos = {origem: 0.0}
+    predecessores = {origem: None}
+    fila = [(0.0, origem)]
+    fechados = set()
+
+    while fila:
+        custo, atual = heapq.heappop(fila)
+        if custo > orcamento:
+            break
+        if atual in fechados:
+            continue
+        fechados.add(atual)
+
+        for vizinho, aresta in grafo[atual].items():
+            novo_custo = custo + aresta[criterio]
+            if novo_custo <= orcamento and novo_custo < custos.get(vizinho, float('inf')):
+                custos[vizinho] = novo_custo
+                predecessores[vizinho] = atual
+                heapq.heappush(fila, (novo_custo, vizinho))
+
+    return custos, predecessores
+
+def caminho_por_predecessores(predecessores, destino):
+    if destino not in predecessores:
+        return None
+    caminho = []
+    while destino is not None:
+        caminho.append(destino)
+        destino = predecessores[destino]
+    return caminho[::-1]
+
+def atualizar_arestas(grafo, alteracoes, pesos):
+    # alteracoes: [(origem, destino, {'distancia': .., 'combustivel': .., 'portagem': ..}), ...]
+    # Critérios omitidos mantêm o valor atual; valores=None remove a aresta.
+    # Devolve as arestas cujo custo mudou, para passar a BuscaIncremental.aplicar_alteracoes().
+    alteradas = []
+    for origem, destino, valores in alteracoes:
+        origem = normalizar_nome_cidade(origem)
+        destino = normalizar_nome_cidade(destino)
+        existe = grafo.has_edge(origem, destino)
+        custo_antigo = grafo.edges[origem, destino]['weight'] if existe else float('inf')
+
+        if valores is None:
+            if existe:
+                grafo.remove_edge(origem, destino)
+                alteradas.append((origem, destino))
+            continue
+
+        atributos = {criterio: grafo.edges[origem, destino][criterio] for criterio in pesos} if existe else {}
+        atributos.update(valores)
+        if any(criterio not in atributos for criterio in pesos):
+            print(f"Aviso: aresta nova {origem} → {destino} sem todos os critérios; ignorada.")
+            continue
+
+        custo = sum(atributos[criterio] * pesos[criterio] for criterio in pesos)
+        grafo.add_edge(origem, destino, weight=custo, **atributos)
+        if custo != custo_antigo:
+            alteradas.append((origem, destino))
+
+    return alteradas
+
+class BuscaIncremental:
+    # LPA* (Lifelong Planning A*): mantém g/rhs entre consultas e, após alterações de custo,
+    # só volta a expandir os vértices cujo custo ficou inconsistente. A origem e o destino são
+    # fixos, pelo que não é preciso o termo km do D* Lite. A heurística tem de ser consistente:
+    # sem coordenadas usa-se h = 0 (o layout de csv_para_grafo não garante consistência).
+
+    def __init__(self, grafo, origem, destino, coordenadas=None):
+        self.grafo = grafo
+        self.origem = origem
+        self.destino = destino
+        self.coordenadas = coordenadas
+        self.g = {}
+        self.rhs = {origem: 0.0}
+        self.fila = []
+        self.na_fila = {}
+        self.expansoes = 0
+        self.expansoes_busca_inicial = 0
+        self.expansoes_ultima_reparacao = 0
+        self.reparacoes = 0
+        self.inserir(origem)
+
+    def h(self, no):
+        if not self.coordenadas:
+            return 0
+        return distancia_euclidiana(no, self.destino, self.coordenadas)
+
+    def chave(self, no):
+        m = min(self.g.get(no, float('inf')), self.rhs.get(no, float('inf')))
+        return (m + self.h(no), m)
+
+    def inserir(self, no):
+        chave = self.chave(no)
+        self.na_fila[no] = chave
+        heapq.heappush(self.fila, (chave, no))
+
+    def topo(self):
+        # Entradas antigas no heap são descartadas de forma preguiçosa
+        while self.fila:
+            chave, no = self.fila[0]
+            if self.na_fila.get(no) == chave:
+                return chave, no
+            heapq.heappop(self.fila)
+        return (float('inf'), float('inf')), None
+
+    def atualizar_vertice(self, no):
+        if no != self.origem:
+            self.rhs[no] = min(
+                (self.g.get(p, float('inf')) + self.grafo.edges[p, no]['weight']
+                 for p in self.grafo.predecessors(no)),
+                default=float('inf')
+            ) if no in self.grafo else float('inf')
+        if self.g.get(no, float('inf')) != self.rhs.get(no, float('inf')):
+            self.inserir(no)
+        else:
+            self.na_fila.pop(no, None)
+
+    def calcular_caminho(self):
+        inicio = self.expansoes
+        while True:
+            chave_topo, no = self.topo()
+            if no is None:
+                break
+            if (chave_topo >= self.chave(self.destino)
+                    and self.rhs.get(self.destino, float('inf')) == self.g.get(self.destino, float('inf'))):
+                break
+
+            heapq.heappop(self.fila)
+            del self.na_fila[no]
+            self.expansoes += 1
+
+            if self.g.get(no, float('inf')) > self.rhs.get(no, float('inf')):
+                self.g[no] = self.rhs[no]
+            else:
+                self.g[no] = float('inf')
+                self.atualizar_vertice(no)
+            for sucessor in self.grafo.successors(no):
+                self.atualizar_vertice(sucessor)
+
+        return self.expansoes - inicio
+
+    def aplicar_alteracoes(self, arestas):
+        # arestas: lista devolvida por atualizar_arestas(); o grafo já deve estar atualizado
+        for _, destino in arestas:
+            self.atualizar_vertice(destino)
+        self.expansoes_ultima_reparacao = self.calcular_caminho()
+        self.reparacoes += 1
+        return self.melhor_caminho()
+
+    def iniciar(self):
+        self.expansoes_busca_inicial = self.calcular_caminho()
+        return self.melhor_caminho()
+
+    def melhor_caminho(self):
+        custo_total = self.g.get(self.destino, float('inf'))
+        if custo_total == float('inf'):
+            return None, None, None
+
+        caminho = [self.destino]
+        atual = self.destino
+        while atual != self.origem:
+            if len(caminho) > self.grafo.number_of_nodes():
+                return None, None, None
+            atual = min(self.grafo.predecessors(atual),
+                        key=lambda p: self.g.get(p, float('inf')) + self.grafo.edges[p, atual]['weight'])
+            caminho.append(atual)
+        caminho.reverse()
+
+        return caminho, custo_total, detalhes_caminho(self.grafo, caminho)
+
+    def estatisticas(self):
+        poupanca = 0.0
+        if self.reparacoes and self.expansoes_busca_inicial:
+            poupanca = 100.0 * (1 - self.expansoes_ultima_reparacao / self.expansoes_busca_inicial)
+        return {
+            'expansoes_busca_inicial': self.expansoes_busca_inicial,
+            'expansoes_ultima_reparacao': self.expansoes_ultima_reparacao,
+            'expansoes_totais': self.expansoes,
+            'reparacoes': self.reparacoes,
+            'poupanca_percentual': poupanca
+        }
+
 def gerar_matriz_adjacencia(df, grafo):
     nos = sorted(set(df['origem']).union(set(df['destino'])))
 
@@ -201,6 +523,17 @@ if __name__ == "__main__":
         for d in detalhes:
             print(f"{d['origem']:<15} {d['destino']:<15} {d['distancia']:>10.2f} {d['combustivel']:>12.2f} {d['portagem']:>8.2f} {d['custo']:>8.2f}")
         print("-" * 80)
+
+        alternativas = k_melhores_caminhos(grafo, origem, destino, k=4)[1:]
+        if alternativas:
+            print("\nRotas alternativas:")
+            print("-" * 80)
+            for n, rota in enumerate(alternativas, start=2):
+                totais = rota['totais']
+                print(f"{n}. {' → '.join(rota['caminho'])}")
+                print(f"   Custo: {rota['custo']:.2f} | Distância: {totais['distancia']:.2f} | "
+                      f"Combustível: {totais['combustivel']:.2f} | Portagem: {totais['portagem']:.2f}")
+            print("-" * 80)
     else:
         print("\nNão existe um caminho possível entre os nós selecionados.")
 
@@ -0,0 +1,224 @@
+import copy
+import csv
+import os
+import numpy as np
+
+
+### === OBSTÁCULOS (ESFERAS E CAIXAS) === ###
+
+class Sphere:
+    def __init__(self, cx, cy, cz, radius):
+        self.center = (cx, cy, cz)
+        self.radius = radius
+        self.min = (cx - radius, cy - radius, cz - radius)
+        self.max = (cx + radius, cy + radius, cz + radius)
+
+    def intersects_segment(self, p0, p1):
+        # Distância do centro ao ponto mais próximo do segmento
+        d = [p1[i] - p0[i] for i in range(3)]
+        f = [p0[i] - self.center[i] for i in range(3)]
+        dd = d[0]*d[0] + d[1]*d[1] + d[2]*d[2]
+        if dd == 0:
+            t = 0.0
+        else:
+            t = -(f[0]*d[0] + f[1]*d[1] + f[2]*d[2]) / dd
+            t = max(0.0, min(1.0, t))
+        cx = f[0] + d[0] * t
+        cy = f[1] + d[1] * t
+        cz = f[2] + d[2] * t
+        return cx*cx + cy*cy + cz*cz <= self.radius * self.radius
+
+
+class Box:
+    def __init__(self, xmin, ymin, zmin, xmax, ymax, zmax):
+        self.min = (min(xmin, xmax), min(ymin, ymax), min(zmin, zmax))
+        self.max = (max(xmin, xmax), max(ymin, ymax), max(zmin, zmax))
+
+    def intersects_segment(self, p0, p1):
+        return segment_intersects_aabb(p0, p1, self.min, self.max)
+
+
+def segment_intersects_aabb(p0, p1, box_min, box_max):
+    # Método das "slabs" restrito a t em [0, 1]
+    t_min, t_max = 0.0, 1.0
+    for i in range(3):
+        d = p1[i] - p0[i]
+        if d == 0:
+            if p0[i] < box_min[i] or p0[i] > box_max[i]:
+                return False
+            continue
+        t1 = (box_min[i] - p0[i]) / d
+        t2 = (box_max[i] - p0[i]) / d
+        if t1 > t2:
+            t1, t2 = t2, t1
+        t_min = max(t_min, t1)
+        t_max = min(t_max, t2)
+        if t_min > t_max:
+            return False
+    return True
+
+
+def load_obstacles(filename):
+    # Formato: "esfera,cx,cy,cz,raio" ou "caixa,xmin,ymin,zmin,xmax,ymax,zmax"
+    obstacles = []
+    if not os.path.exists(filename):
+        return obstacles
+
+    try:
+        with open(filename, newline='', encoding='utf-8') as csvfile:
+            reader = csv.reader(csvfile)
+            for row in reader:
+                if not row:
+                    continue
+                tipo = row[0].strip().lower()
+                try:
+                    valores = [float(v) for v in row[1:]]
+                except ValueError:
+                    continue
+                if tipo in ("esfera", "sphere") and len(valores) >= 4:
+                    obstacles.append(Sphere(*valores[:4]))
+                elif tipo in ("caixa", "box") and len(valores) >= 6:
+                    obstacles.append(Box(*valores[:6]))
+    except Exception as e:
+        print(f"Erro ao ler obstáculos: {e}")
+
+    return obstacles
+
+
+def obstacles_filename(nodes_filename):
+    # Ficheiro de obstáculos ao lado do ficheiro de nós: grafo.csv -> grafo_obstaculos.csv
+    base, ext = os.path.splitext(nodes_filename)
+    return f"{base}_obstaculos{ext or '.csv'}"
+
+
+### === HIERARQUIA DE VOLUMES ENVOLVENTES (BVH) === ###
+
+class BVHNode:
+    def __init__(self, box_min, box_max, left=None, right=None, obstacles=None):
+        self.min = box_min
+        self.max = box_max
+        self.left = left
+        self.right = right
+        self.obstacles = obstacles
+
+
+def build_bvh(obstacles, leaf_size=4):
+    if not obstacles:
+        return None
+
+    box_min = tuple(min(o.min[i] for o in obstacles) for i in range(3))
+    box_max = tuple(max(o.max[i] for o in obstacles) for i in range(3))
+
+    if len(obstacles) <= leaf_size:
+        return BVHNode(box_min, box_max, obstacles=obstacles)
+
+    # Divide pela mediana dos centros no eixo mais comprido
+    axis = max(range(3), key=lambda i: box_max[i] - box_min[i])
+    ordered = sorted(obstacles, key=lambda o: o.min[axis] + o.max[axis])
+    mid = len(ordered) // 2
+    return BVHNode(box_min, box_max,
+                   left=build_bvh(ordered[:mid], leaf_size),
+                   right=build_bvh(ordered[mid:], leaf_size))
+
+
+class CollisionChecker:
+    def __init__(self, obstacles, leaf_size=4):
+        self.obstacles = list(obstacles)
+        self.root = build_bvh(self.obstacles, leaf_size)
+
+        # Arrays para verificação vetorizada de muitos segmentos de uma vez
+        spheres = [o for o in self.obstacles if isinstance(o, Sphere)]
+        boxes = [o for o in self.obstacles if isinstance(o, Box)]
+        self.sphere_centers = np.array([o.center for o in spheres], dtype=float).reshape(-1, 3)
+        self.sphere_radii = np.array([o.radius for o in spheres], dtype=float)
+        self.box_mins = np.array([o.min for o in boxes], dtype=float).reshape(-1, 3)
+        self.box_maxs = np.array([o.max for o in boxes], dtype=float).reshape(-1, 3)
+
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.checks = 0
+        self.bvh_tests = 0
+        self.narrow_tests = 0
+
+    def view(self):
+        # Cópia leve com contadores próprios; partilha a BVH e os arrays (só de leitura),
+        # para várias threads usarem os mesmos obstáculos sem misturar estatísticas
+        checker = copy.copy(self)
+        checker.reset_counters()
+        return checker
+
+    def segment_free(self, p0, p1):
+        self.checks += 1
+        if self.root is None:
+            return True
+
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            self.bvh_tests += 1
+            if not segment_intersects_aabb(p0, p1, node.min, node.max):
+                continue
+            if node.obstacles is not None:
+                for obstacle in node.obstacles:
+                    self.narrow_tests += 1
+                    if obstacle.intersects_segment(p0, p1):
+                        return False
+            else:
+                stack.append(node.left)
+                stack.append(node.right)
+        return True
+
+    def segments_free(self, starts, ends):
+        # Versão vetorizada: starts/ends (M, 3) -> array booleano (M,)
+        starts = np.asarray(starts, dtype=float).reshape(-1, 3)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 3)
+        self.checks += len(starts)
+        free = np.ones(len(starts), dtype=bool)
+
+        if len(self.sphere_radii):
+            self.narrow_tests += len(starts) * len(self.sphere_radii)
+            d = ends - starts
+            f = starts[:, None, :] - self.sphere_centers[None, :, :]
+            dd = np.einsum('ij,ij->i', d, d)[:, None]
+            fd = np.einsum('ijk,ik->ij', f, d)
+            t = np.clip(np.divide(-fd, dd, out=np.zeros_like(fd), where=dd > 0), 0.0, 1.0)
+            closest = f + d[:, None, :] * t[:, :, None]
+            hit = np.einsum('ijk,ijk->ij', closest, closest) <= self.sphere_radii[None, :] ** 2
+            free &= ~hit.any(axis=1)
+
+        if len(self.box_mins):
+            self.narrow_tests += len(starts) * len(self.box_mins)
+            d = (ends - starts)[:, None, :]
+            p0 = starts[:, None, :]
+            parallel = d == 0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t1 = (self.box_mins[None, :, :] - p0) / d
+                t2 = (self.box_maxs[None, :, :] - p0) / d
+            t_near = np.where(parallel, -np.inf, np.minimum(t1, t2))
+            t_far = np.where(parallel, np.inf, np.maximum(t1, t2))
+            inside = ~parallel | ((p0 >= self.box_mins[None, :, :]) & (p0 <= self.box_maxs[None, :, :]))
+            t_min = np.maximum(t_near.max(axis=2), 0.0)
+            t_max = np.minimum(t_far.min(axis=2), 1.0)
+            hit = inside.all(axis=2) & (t_min <= t_max)
+            free &= ~hit.any(axis=1)
+
+        return free
+
+    def point_free(self, p):
+        return self.segment_free(p, p)
+
+    def stats(self):
+        return [
+            f"Obstáculos: {len(self.obstacles)}",
+            f"Verificações de colisão: {self.checks}",
+            f" - Testes BVH: {self.bvh_tests}",
+            f" - Testes exatos: {self.narrow_tests}"
+        ]
+
+
+def load_collision_checker(nodes_filename):
+    obstacles = load_obstacles(obstacles_filename(nodes_filename))
+    if not obstacles:
+        return None
+    return CollisionChecker(obstacles)
@@ -0,0 +1,125 @@
+import time
+import numpy as np
+
+
+### === PÓS-PROCESSAMENTO DE CAMINHOS (ATALHOS E SUAVIZAÇÃO) === ###
+
+def path_to_array(path):
+    return np.array([(node.x, node.y, node.z) for node in path], dtype=float)
+
+def array_to_path(points, node_class):
+    path = []
+    parent = None
+    for x, y, z in points:
+        node = node_class(float(x), float(y), float(z))
+        node.parent = parent
+        path.append(node)
+        parent = node
+    return path
+
+def segments_free(starts, ends, collision_checker=None):
+    if collision_checker is None:
+        return np.ones(len(starts), dtype=bool)
+    return collision_checker.segments_free(starts, ends)
+
+def greedy_shortcut(points, collision_checker=None):
+    # A partir de cada waypoint liga ao waypoint mais distante visível (um teste vetorizado por salto)
+    if len(points) <= 2:
+        return points
+
+    kept = [0]
+    i = 0
+    last = len(points) - 1
+    while i < last:
+        candidates = np.arange(i + 1, last + 1)
+        starts = np.repeat(points[i][None, :], len(candidates), axis=0)
+        free = segments_free(starts, points[candidates], collision_checker)
+        visible = candidates[free]
+        # O segmento seguinte pertence ao caminho original, por isso é sempre aceite
+        i = int(visible.max()) if len(visible) else i + 1
+        kept.append(i)
+
+    return points[kept]
+
+def random_shortcut(points, collision_checker=None, iterations=50, rng=None):
+    # Atalhos aleatórios: testa 16 pares (i, j) em lote e aplica o que remove mais waypoints
+    rng = rng if rng is not None else np.random.default_rng()
+    for _ in range(iterations):
+        n = len(points)
+        if n <= 2:
+            break
+        i = rng.integers(0, n - 2, size=16)
+        j = np.minimum(i + 2 + rng.integers(0, n, size=16), n - 1)
+        free = segments_free(points[i], points[j], collision_checker)
+        if not free.any():
+            continue
+        best = int(np.argmax(np.where(free, j - i, -1)))
+        points = np.concatenate([points[:i[best] + 1], points[j[best]:]])
+    return points
+
+def catmull_rom(points, samples_per_segment=4):
+    if len(points) <= 2:
+        return points
+
+    padded = np.vstack([points[0], points, points[-1]])
+    t = np.linspace(0.0, 1.0, samples_per_segment, endpoint=False)[:, None]
+    t2, t3 = t * t, t * t * t
+    curves = []
+    for k in range(1, len(padded) - 2):
+        p0, p1, p2, p3 = padded[k - 1], padded[k], padded[k + 1], padded[k + 2]
+        curves.append(0.5 * ((2 * p1) + (-p0 + p2) * t +
+                             (2 * p0 - 5 * p1 + 4 * p2 - p3) * t2 +
+                             (-p0 + 3 * p1 - 3 * p2 + p3) * t3))
+    curves.append(points[-1][None, :])
+    return np.vstack(curves)
+
+def smooth_path(points, collision_checker=None, samples_per_segment=4):
+    smoothed = catmull_rom(points, samples_per_segment)
+    # Se a curva atravessar um obstáculo mantém-se o caminho poligonal
+    if not segments_free(smoothed[:-1], smoothed[1:], collision_checker).all():
+        return points
+    return smoothed
+
+def weighted_stats(points, peso_x=2.0, peso_y=1.0, peso_z=1.0):
+    if len(points) < 2:
+        return 0.0, 0.0, 0.0, 0.0, 0.0
+    deltas = np.abs(np.diff(points, axis=0))
+    delta_x, delta_y, delta_z = deltas.sum(axis=0)
+    total_length = float(np.sqrt((deltas ** 2).sum(axis=1)).sum())
+    custo_ponderado = delta_x * peso_x + delta_y * peso_y + delta_z * peso_z
+    return total_length, custo_ponderado, delta_x, delta_y, delta_z
+
+def post_process(path, collision_checker=None, shortcut=True, shortcut_iterations=50, smooth=False,
+                 samples_per_segment=4):
+    # shortcut: liga/desliga os atalhos (guloso e aleatório); shortcut_iterations só afeta o aleatório
+    start_time = time.time()
+    if not path or len(path) <= 2:
+        return path, []
+
+    points = path_to_array(path)
+    original_length = weighted_stats(points)[0]
+
+    if shortcut:
+        points = greedy_shortcut(points, collision_checker)
+        if shortcut_iterations:
+            points = random_shortcut(points, collision_checker, shortcut_iterations)
+    if smooth:
+        points = smooth_path(points, collision_checker, samples_per_segment)
+
+    new_path = array_to_path(points, type(path[0]))
+    execution_time = time.time() - start_time
+
+    peso_x, peso_y, peso_z = 2.0, 1.0, 1.0
+    total_length, custo_ponderado, delta_x, delta_y, delta_z = weighted_stats(points, peso_x, peso_y, peso_z)
+    reducao = 100.0 * (1 - total_length / original_length) if original_length > 0 else 0.0
+
+    stats = [
+        f"Tempo de pós-processamento: {execution_time:.4f} segundos",
+        f"Nós no caminho (pós-processado): {len(new_path)} (antes: {len(path)})",
+        f"Comprimento total (euclidiano): {total_length:.2f} ({reducao:.1f}% menor)",
+        f"Custo total ponderado: {custo_ponderado:.2f} ",
+        f" - Portagem total: {delta_x:.2f}  (peso = {peso_x})",
+        f" - Distancia total: {delta_y:.2f}  (peso = {peso_y})",
+        f" - Gasolina total: {delta_z:.2f}  (peso = {peso_z})"
+    ]
+    return new_path, stats
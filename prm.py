@@ -0,0 +1,273 @@
+import csv
+import heapq
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+import numpy as np
+from obstaculos import obstacles_filename
+from pos_processamento import path_to_array, weighted_stats
+
+
+### === ÍNDICE ESPACIAL (KD-TREE) === ###
+
+class KDNode:
+    def __init__(self, indices=None, axis=None, split=None, left=None, right=None):
+        self.indices = indices
+        self.axis = axis
+        self.split = split
+        self.left = left
+        self.right = right
+
+
+class KDTree:
+    def __init__(self, points, leaf_size=16):
+        self.points = np.asarray(points, dtype=float).reshape(-1, 3)
+        self.leaf_size = leaf_size
+        self.root = self.build(np.arange(len(self.points))) if len(self.points) else None
+
+    def build(self, indices):
+        if len(indices) <= self.leaf_size:
+            return KDNode(indices=indices)
+
+        pts = self.points[indices]
+        axis = int(np.argmax(pts.max(axis=0) - pts.min(axis=0)))
+        order = indices[np.argsort(pts[:, axis], kind="stable")]
+        mid = len(order) // 2
+        return KDNode(axis=axis, split=self.points[order[mid], axis],
+                      left=self.build(order[:mid]), right=self.build(order[mid:]))
+
+    def query(self, point, k):
+        # Devolve [(distância, índice)] dos k pontos mais próximos, por ordem crescente
+        if self.root is None or k <= 0:
+            return []
+        point = np.asarray(point, dtype=float)
+        best = []  # max-heap com (-distância, índice)
+
+        def search(node):
+            if node.indices is not None:
+                dists = np.sqrt(((self.points[node.indices] - point) ** 2).sum(axis=1))
+                for d, i in zip(dists, node.indices):
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, int(i)))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, int(i)))
+                return
+            diff = point[node.axis] - node.split
+            near, far = (node.left, node.right) if diff < 0 else (node.right, node.left)
+            search(near)
+            if len(best) < k or abs(diff) < -best[0][0]:
+                search(far)
+
+        search(self.root)
+        return sorted((-d, i) for d, i in best)
+
+
+### === ROADMAP PROBABILÍSTICO (PRM) === ###
+
+def load_csv_connections(filename):
+    # Pares origem/destino do CSV (o load_csv dos módulos RRT só guarda as coordenadas)
+    connections = []
+    try:
+        with open(filename, newline='', encoding='utf-8') as csvfile:
+            for row in csv.reader(csvfile):
+                if len(row) < 5:
+                    continue
+                try:
+                    [float(v) for v in row[2:5]]
+                except ValueError:
+                    continue
+                connections.append((row[0], row[1]))
+    except Exception as e:
+        print(f"Erro ao ler ligações do CSV: {e}")
+    return connections
+
+
+class Roadmap:
+    # Só arrays simples (nomes, coordenadas, pares e pesos), para a cache em disco não
+    # precisar de pickle; build_roadmap constrói um a partir dos nós do CSV
+    def __init__(self, names, coords, pairs, weights, k, build_time=0.0):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+        self.pairs = np.asarray(pairs, dtype=int).reshape(-1, 2)
+        self.weights = np.asarray(weights, dtype=float)
+        self.k = k
+        self.adjacency = {name: {} for name in self.names}
+        for (i, j), w in zip(self.pairs, self.weights):
+            a, b = self.names[i], self.names[j]
+            self.adjacency[a][b] = float(w)
+            self.adjacency[b][a] = float(w)
+
+        self.edge_count = len(self.pairs)
+        self.build_time = build_time
+
+    def query(self, start_name, goal_name):
+        # A* sobre o roadmap com heurística euclidiana (admissível: pesos são distâncias)
+        if start_name not in self.index or goal_name not in self.index:
+            return None, float('inf'), 0
+
+        goal = self.coords[self.index[goal_name]]
+
+        def heuristic(name):
+            x, y, z = self.coords[self.index[name]]
+            return math.sqrt((x - goal[0])**2 + (y - goal[1])**2 + (z - goal[2])**2)
+
+        g_score = {start_name: 0.0}
+        came_from = {}
+        open_set = [(heuristic(start_name), start_name)]
+        closed = set()
+        expanded = 0
+
+        while open_set:
+            _, current = heapq.heappop(open_set)
+            if current in closed:
+                continue
+            closed.add(current)
+            expanded += 1
+
+            if current == goal_name:
+                path = [current]
+                while current in came_from:
+                    current = came_from[current]
+                    path.append(current)
+                return path[::-1], g_score[goal_name], expanded
+
+            for neighbor, w in self.adjacency[current].items():
+                tentative = g_score[current] + w
+                if tentative < g_score.get(neighbor, float('inf')):
+                    g_score[neighbor] = tentative
+                    came_from[neighbor] = current
+                    heapq.heappush(open_set, (tentative + heuristic(neighbor), neighbor))
+
+        return None, float('inf'), expanded
+
+
+def build_roadmap(nodes, k=8, connections=None, collision_checker=None):
+    start_time = time.time()
+    names = list(nodes.keys())
+    index = {name: i for i, name in enumerate(names)}
+    coords = np.array([nodes[name] for name in names], dtype=float).reshape(-1, 3)
+
+    # Candidatos: k vizinhos mais próximos de cada nó + ligações do CSV
+    candidates = set()
+    kdtree = KDTree(coords)
+    for i in range(len(names)):
+        for _, j in kdtree.query(coords[i], k + 1):
+            if j != i:
+                candidates.add((min(i, j), max(i, j)))
+    for origem, destino in connections or []:
+        if origem in index and destino in index and origem != destino:
+            i, j = index[origem], index[destino]
+            candidates.add((min(i, j), max(i, j)))
+
+    pairs = np.array(sorted(candidates), dtype=int).reshape(-1, 2)
+    if collision_checker is not None and len(pairs):
+        pairs = pairs[collision_checker.segments_free(coords[pairs[:, 0]], coords[pairs[:, 1]])]
+
+    weights = np.sqrt(((coords[pairs[:, 0]] - coords[pairs[:, 1]]) ** 2).sum(axis=1))
+    return Roadmap(names, coords, pairs, weights, k, time.time() - start_time)
+
+
+### === CACHE EM MEMÓRIA E EM DISCO === ###
+
+# Um roadmap por ficheiro CSV (o mais recente), até ROADMAP_CACHE_SIZE ficheiros
+ROADMAP_CACHE_SIZE = 4
+_roadmap_cache = OrderedDict()
+
+def roadmap_cache_key(filename, k):
+    # Invalida a cache quando o CSV ou o ficheiro de obstáculos mudam
+    key = [os.path.abspath(filename), k]
+    for f in (filename, obstacles_filename(filename)):
+        if os.path.exists(f):
+            stat = os.stat(f)
+            key.extend([stat.st_mtime_ns, stat.st_size])
+        else:
+            key.extend([None, None])
+    return tuple(key)
+
+def roadmap_cache_file(filename, k):
+    base, _ = os.path.splitext(filename)
+    return f"{base}_prm_k{k}.npz"
+
+def save_roadmap(cache_file, key, roadmap):
+    # Formato .npz só com arrays numéricos e de texto: ao contrário de pickle, carregar
+    # um ficheiro alheio colocado junto ao CSV não executa código
+    np.savez(cache_file, key=np.array(json.dumps(key)), names=np.array(roadmap.names, dtype=str),
+             coords=roadmap.coords, pairs=roadmap.pairs, weights=roadmap.weights,
+             k=np.array(roadmap.k), build_time=np.array(roadmap.build_time))
+
+def load_roadmap(cache_file, key):
+    with np.load(cache_file, allow_pickle=False) as data:
+        if json.loads(str(data["key"])) != list(key):
+            return None
+        return Roadmap(data["names"].tolist(), data["coords"], data["pairs"], data["weights"],
+                       int(data["k"]), float(data["build_time"]))
+
+def remember_roadmap(filename, key, roadmap):
+    _roadmap_cache[os.path.abspath(filename)] = (key, roadmap)
+    _roadmap_cache.move_to_end(os.path.abspath(filename))
+    while len(_roadmap_cache) > ROADMAP_CACHE_SIZE:
+        _roadmap_cache.popitem(last=False)
+
+def get_roadmap(filename, nodes, k=8, collision_checker=None, use_disk=True):
+    key = roadmap_cache_key(filename, k)
+    cached = _roadmap_cache.get(os.path.abspath(filename))
+    if cached and cached[0] == key:
+        _roadmap_cache.move_to_end(os.path.abspath(filename))
+        return cached[1]
+
+    cache_file = roadmap_cache_file(filename, k)
+    if use_disk and os.path.exists(cache_file):
+        try:
+            roadmap = load_roadmap(cache_file, key)
+            if roadmap is not None:
+                remember_roadmap(filename, key, roadmap)
+                return roadmap
+        except Exception as e:
+            print(f"Cache do roadmap inválida, a reconstruir: {e}")
+
+    roadmap = build_roadmap(nodes, k, load_csv_connections(filename), collision_checker)
+    remember_roadmap(filename, key, roadmap)
+    if use_disk:
+        try:
+            save_roadmap(cache_file, key, roadmap)
+        except OSError as e:
+            print(f"Não foi possível gravar a cache do roadmap: {e}")
+    return roadmap
+
+def prm_query(filename, nodes, start_name, goal_name, node_class, k=8, collision_checker=None):
+    # Devolve (path, stats) com o caminho como lista de nós ligados por parent, como os planeadores RRT
+    start_time = time.time()
+    roadmap = get_roadmap(filename, nodes, k, collision_checker)
+    names, cost, expanded = roadmap.query(start_name, goal_name)
+    execution_time = time.time() - start_time
+
+    if not names:
+        return None, ["Nenhum caminho encontrado no roadmap."]
+
+    path = []
+    parent = None
+    for name in names:
+        node = node_class(*nodes[name], name=name)
+        node.parent = parent
+        path.append(node)
+        parent = node
+
+    stats = [
+        f"Tempo de consulta: {execution_time:.4f} segundos",
+        f"Roadmap: {len(roadmap.names)} nós, {roadmap.edge_count} arestas (k = {roadmap.k}, "
+        f"construído em {roadmap.build_time:.4f} s)",
+        f"Nós expandidos na pesquisa: {expanded}",
+        f"Nós no caminho: {len(path)} ({' → '.join(names)})",
+        f"Comprimento total (euclidiano): {cost:.2f}"
+    ]
+    _, custo_ponderado, delta_x, delta_y, delta_z = weighted_stats(path_to_array(path))
+    stats.extend([
+        f"Custo total ponderado: {custo_ponderado:.2f} ",
+        f" - Portagem total: {delta_x:.2f}  (peso = 2.0)",
+        f" - Distancia total: {delta_y:.2f}  (peso = 1.0)",
+        f" - Gasolina total: {delta_z:.2f}  (peso = 1.0)"
+    ])
+    return path, stats
@@ -1,12 +1,19 @@
 import csv
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
 import numpy as np
 import math
 import time
 import os
+import queue
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
+from obstaculos import load_collision_checker
+from pos_processamento import post_process
+from cache_arvores import TreeCache, bounds_for_nodes, tree_key
+from prm import prm_query
 
 
 ### === LÓGICA DO ALGORITMO RRT 3D === ###
@@ -85,17 +92,70 @@ def steer(from_node, to_node, step_size):
         new_z = from_node.z + dz * scale
         return Node(new_x, new_y, new_z)
 
-def rrt(start, goal, max_iter=5000, step_size=3.0, goal_sample_rate=0.2, return_stats=False):
+def extract_path(goal_node):
+    path = []
+    current = goal_node
+    while current:
+        path.append(current)
+        current = current.parent
+    return path[::-1]
+
+def goal_reached(path):
+    # Sem solução o caminho contém apenas o nó objetivo, sem pai
+    return len(path) > 1
+
+def rrt(start, goal, max_iter=5000, step_size=3.0, goal_sample_rate=0.2, return_stats=False,
+        time_limit_ms=None, on_solution=None, collision_checker=None,
+        progress_callback=None, progress_every=100, cancel_event=None, profiler=None,
+        tree=None, bounds=None):
+    # time_limit_ms: orçamento de tempo (ms); ao expirar devolve o que tiver sido encontrado
+    # on_solution(path, cost, iteration): chamado quando o objetivo é alcançado
+    # collision_checker: obstaculos.CollisionChecker; None = espaço livre
+    # progress_callback(iteration, tree_size, best_cost): chamado a cada `progress_every` iterações
+    # cancel_event: threading.Event; quando ativado o planeamento termina na iteração seguinte
+    # profiler: instrumentacao.Profiler para tempos por fase e contadores; None = desligado
+    # tree: árvore de uma consulta anterior com a mesma origem (é estendida no lugar)
+    # bounds: ((xmin, xmax), (ymin, ymax), (zmin, zmax)) de amostragem; por omissão ±50 à volta
+    #   de origem e destino (para reutilizar árvores os limites têm de ser fixos, ver cache_arvores)
     start_time = time.time()
-    start_node = Node(*start, name="Start")
+    deadline = start_time + time_limit_ms / 1000.0 if time_limit_ms is not None else None
     goal_node = Node(*goal, name="Goal")
-    tree = [start_node]
-
-    x_range = (min(start[0], goal[0])-50, max(start[0], goal[0])+50)
-    y_range = (min(start[1], goal[1])-50, max(start[1], goal[1])+50)
-    z_range = (min(start[2], goal[2])-50, max(start[2], goal[2])+50)
+    if tree is None:
+        tree = [Node(*start, name="Start")]
+    reused_nodes = len(tree) - 1
+
+    if collision_checker:
+        collision_checker.reset_counters()
+
+    if bounds is None:
+        bounds = tuple((min(start[i], goal[i])-50, max(start[i], goal[i])+50) for i in range(3))
+    x_range, y_range, z_range = bounds
+
+    # Árvore reutilizada: o objetivo pode já estar ao alcance de um nó existente
+    if reused_nodes:
+        for node in sorted(tree, key=lambda node: distance(node, goal_node)):
+            if distance(node, goal_node) >= step_size * 2.0:
+                break
+            if not collision_checker or collision_checker.segment_free(
+                    (node.x, node.y, node.z), (goal_node.x, goal_node.y, goal_node.z)):
+                goal_node.parent = node
+                if on_solution:
+                    solution = extract_path(goal_node)
+                    on_solution(solution, sum(distance(solution[i - 1], solution[i])
+                                              for i in range(1, len(solution))), 0)
+                break
+
+    for iteration in range(max_iter if goal_node.parent is None else 0):
+        if deadline is not None and time.time() >= deadline:
+            break
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        if progress_callback and iteration % progress_every == 0:
+            progress_callback(iteration, len(tree), float('inf'))
+        if profiler:
+            profiler.count("iterations")
+            t = profiler.start()
 
-    for iteration in range(max_iter):
         if np.random.random() < goal_sample_rate:
             rand_node = goal_node
         else:
@@ -103,26 +163,57 @@ def rrt(start, goal, max_iter=5000, step_size=3.0, goal_sample_rate=0.2, return_
             rand_y = np.random.uniform(y_range[0], y_range[1])
             rand_z = np.random.uniform(z_range[0], z_range[1])
             rand_node = Node(rand_x, rand_y, rand_z)
+        if profiler:
+            t = profiler.lap("sampling", t)
 
         nearest = min(tree, key=lambda node: distance(node, rand_node))
         new_node = steer(nearest, rand_node, step_size)
-
-        if any(distance(node, new_node) < step_size/10 for node in tree):
+        if profiler:
+            t = profiler.lap("nearest", t)
+
+        duplicate = any(distance(node, new_node) < step_size/10 for node in tree)
+        if profiler:
+            t = profiler.lap("duplicate_check", t)
+        if duplicate:
+            if profiler:
+                profiler.count("rejected_samples")
             continue
 
+        if collision_checker:
+            free = collision_checker.segment_free(
+                (nearest.x, nearest.y, nearest.z), (new_node.x, new_node.y, new_node.z))
+            if profiler:
+                t = profiler.lap("collision", t)
+            if not free:
+                if profiler:
+                    profiler.count("collision_rejections")
+                continue
+
         new_node.parent = nearest
         tree.append(new_node)
+        if profiler:
+            profiler.count("nodes_expanded")
 
-        if distance(new_node, goal_node) < step_size * 2.0:
+        if distance(new_node, goal_node) < step_size * 2.0 and (
+                not collision_checker or collision_checker.segment_free(
+                    (new_node.x, new_node.y, new_node.z), (goal_node.x, goal_node.y, goal_node.z))):
             goal_node.parent = new_node
+            if on_solution or progress_callback:
+                solution = extract_path(goal_node)
+                cost = sum(distance(solution[i - 1], solution[i]) for i in range(1, len(solution)))
+                if on_solution:
+                    on_solution(solution, cost, iteration)
+                if progress_callback:
+                    progress_callback(iteration, len(tree), cost)
+            if profiler:
+                profiler.lap("goal_check", t)
             break
+        if profiler:
+            profiler.lap("goal_check", t)
 
-    path = []
-    current = goal_node
-    while current:
-        path.append(current)
-        current = current.parent
-    path = path[::-1]
+    if profiler:
+        t = profiler.start()
+    path = extract_path(goal_node)
 
     execution_time = time.time() - start_time
 
@@ -159,21 +250,39 @@ def rrt(start, goal, max_iter=5000, step_size=3.0, goal_sample_rate=0.2, return_
         f" - Distancia total: {delta_y:.2f}  (peso = {peso_y})",
         f" - Gasolina total: {delta_z:.2f}  (peso = {peso_z})"
     ]
+    if reused_nodes:
+        stats.append(f"Nós reutilizados de consultas anteriores: {reused_nodes}")
+    if collision_checker:
+        stats.extend(collision_checker.stats())
+    if profiler:
+        profiler.lap("stats", t)
+        stats.extend(profiler.stats())
+        profiler.finish()
 
     if return_stats:
         return path, tree, stats
     return path, tree
 
-def plot_result(tree, path, start, goal, start_name, goal_name):
+def tree_segments(tree, max_edges=None):
+    segments = np.array([((node.x, node.y, node.z), (node.parent.x, node.parent.y, node.parent.z))
+                         for node in tree if node.parent], dtype=float).reshape(-1, 2, 3)
+    # Árvores grandes: amostra reprodutível das arestas (nível de detalhe)
+    if max_edges is not None and len(segments) > max_edges:
+        keep = np.random.default_rng(0).choice(len(segments), size=max_edges, replace=False)
+        segments = segments[np.sort(keep)]
+    return segments
+
+def plot_result(tree, path, start, goal, start_name, goal_name, max_edges=3000, output_file=None):
+    # output_file: grava a figura em ficheiro (sem janela) em vez de a mostrar
     fig = plt.figure(figsize=(10, 10))
     ax = fig.add_subplot(111, projection='3d')
 
-    for node in tree:
-        if node.parent:
-            ax.plot([node.x, node.parent.x],
-                    [node.y, node.parent.y],
-                    [node.z, node.parent.z],
-                    color='lightblue', linewidth=2.0)
+    # Todas as arestas da árvore num único artista
+    segments = tree_segments(tree, max_edges)
+    if len(segments):
+        ax.add_collection3d(Line3DCollection(segments, colors='lightblue', linewidths=2.0))
+        limits = np.vstack([segments.reshape(-1, 3), [start, goal]])
+        ax.auto_scale_xyz(limits[:, 0], limits[:, 1], limits[:, 2])
 
     if path:
         path_x = [node.x for node in path]
@@ -192,7 +301,12 @@ def plot_result(tree, path, start, goal, start_name, goal_name):
     ax.set_ylabel("Y")
     ax.set_zlabel("Z")
     ax.legend()
-    plt.show()
+
+    if output_file:
+        fig.savefig(output_file)
+        plt.close(fig)
+    else:
+        plt.show()
 
 ### === INTERFACE GRÁFICA COM TKINTER === ###
 
@@ -205,6 +319,14 @@ class RRTApp:
 
         self.nodes_dict = {}
         self.node_name_map = {}
+        self.collision_checker = None
+        self.tree_cache = TreeCache(capacity=8)
+        self.file_path = None
+
+        # Planeamento em segundo plano: a thread de trabalho comunica pela fila
+        self.worker = None
+        self.cancel_event = threading.Event()
+        self.result_queue = queue.Queue()
 
         self.create_widgets()
 
@@ -242,11 +364,44 @@ class RRTApp:
         self.goal_combobox = ttk.Combobox(main_frame, state="readonly", font=style_font, width=30)
         self.goal_combobox.grid(row=2, column=1, pady=5)
 
-        # === Botão Executar ===
-        self.run_button = tk.Button(self.master, text="▶Executar RRT", command=self.run_rrt,
+        # === Pós-processamento do caminho ===
+        self.shortcut_var = tk.BooleanVar(value=False)
+        self.smooth_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(main_frame, text="Encurtar caminho (atalhos)", variable=self.shortcut_var, font=style_font,
+                       bg="#f4f4f4").grid(row=3, column=0, columnspan=2, sticky="w")
+        tk.Checkbutton(main_frame, text="Suavizar caminho (spline)", variable=self.smooth_var, font=style_font,
+                       bg="#f4f4f4").grid(row=4, column=0, columnspan=2, sticky="w")
+
+        # === Algoritmo: RRT (árvore nova a cada consulta) ou PRM (roadmap reutilizado) ===
+        self.mode_label = tk.Label(main_frame, text="Algoritmo:", font=style_font, bg="#f4f4f4")
+        self.mode_label.grid(row=5, column=0, sticky="e", padx=5, pady=5)
+        self.mode_combobox = ttk.Combobox(main_frame, state="readonly", font=style_font, width=30,
+                                          values=["RRT", "PRM (multi-consulta)"])
+        self.mode_combobox.current(0)
+        self.mode_combobox.grid(row=5, column=1, pady=5)
+
+        # === Reutilização da árvore entre consultas com a mesma origem ===
+        self.reuse_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(main_frame, text="Reutilizar árvore da mesma origem", variable=self.reuse_var, font=style_font,
+                       bg="#f4f4f4").grid(row=6, column=0, columnspan=2, sticky="w")
+
+        # === Botões Executar / Cancelar ===
+        buttons_frame = tk.Frame(self.master, bg="#f4f4f4")
+        buttons_frame.pack(pady=(20, 5))
+
+        self.run_button = tk.Button(buttons_frame, text="▶Executar RRT", command=self.run_rrt,
                                     font=("Segoe UI", 12, "bold"), bg="#27ae60", fg="white", relief="flat", padx=12,
                                     pady=6)
-        self.run_button.pack(pady=20)
+        self.run_button.pack(side="left", padx=5)
+
+        self.cancel_button = tk.Button(buttons_frame, text="■ Cancelar", command=self.cancel_rrt,
+                                       font=("Segoe UI", 12, "bold"), bg="#c0392b", fg="white", relief="flat",
+                                       padx=12, pady=6, state="disabled")
+        self.cancel_button.pack(side="left", padx=5)
+
+        # === Progresso ===
+        self.progress_label = tk.Label(self.master, text="", font=("Segoe UI", 10), fg="#7f8c8d", bg="#f4f4f4")
+        self.progress_label.pack(pady=(0, 5))
 
         # === Frame das estatísticas ===
         stats_frame = tk.LabelFrame(self.master, text="Estatísticas do Caminho", font=("Segoe UI", 12, "bold"),
@@ -264,14 +419,22 @@ class RRTApp:
             if nodes_dict:
                 self.nodes_dict = nodes_dict
                 self.node_name_map = name_map
+                self.file_path = file_path
                 nomes = list(nodes_dict.keys())
                 self.start_combobox['values'] = nomes
                 self.goal_combobox['values'] = nomes
 
+                # Obstáculos opcionais em <nome>_obstaculos.csv
+                self.collision_checker = load_collision_checker(file_path)
+                self.tree_cache.clear()
+                obstaculos_info = ""
+                if self.collision_checker:
+                    obstaculos_info = f" ({len(self.collision_checker.obstacles)} obstáculos)"
+
                 # Atualiza o label com o nome do ficheiro carregado
                 filename = os.path.basename(file_path)
                 self.current_file_label.config(
-                    text=f"Ficheiro carregado: {filename}",
+                    text=f"Ficheiro carregado: {filename}{obstaculos_info}",
                     fg="#2c3e50",
                     font=("Segoe UI", 10, "bold")
                 )
@@ -280,6 +443,9 @@ class RRTApp:
                 messagebox.showerror("Erro", "Falha ao carregar o ficheiro CSV.")
 
     def run_rrt(self):
+        if self.worker and self.worker.is_alive():
+            return
+
         start_name = self.start_combobox.get()
         goal_name = self.goal_combobox.get()
 
@@ -294,20 +460,103 @@ class RRTApp:
             messagebox.showerror("Erro", "Nó de origem ou destino inválido.")
             return
 
+        use_prm = self.mode_combobox.current() == 1
         self.stats_text.delete(1.0, tk.END)
-        self.stats_text.insert(tk.END, "Executando algoritmo RRT...\n")
+        self.stats_text.insert(tk.END, "Consultando roadmap PRM...\n" if use_prm else "Executando algoritmo RRT...\n")
+        self.progress_label.config(text="")
+        # O worker lê o CSV, os obstáculos e a cache de árvores: não se pode trocar de ficheiro a meio
+        self.run_button.config(state="disabled")
+        self.load_button.config(state="disabled")
+        self.cancel_button.config(state="normal")
+
+        self.cancel_event.clear()
+        self.result_queue = queue.Queue()
+        self.worker = threading.Thread(
+            target=self.plan_worker,
+            args=(self.result_queue, start, goal, self.shortcut_var.get(), self.smooth_var.get(),
+                  (start_name, goal_name) if use_prm else None, self.reuse_var.get()),
+            daemon=True
+        )
+        self.worker.start()
+        self.master.after(100, self.poll_worker, start, goal, start_name, goal_name)
+
+    def plan_worker(self, result_queue, start, goal, shortcut, smooth, prm_names=None, reuse_tree=False):
+        # Corre fora da thread do Tk: não pode tocar em widgets, só na fila
+        def progress(iteration, tree_size, best_cost):
+            result_queue.put(("progress", (iteration, tree_size, best_cost)))
+
+        try:
+            if prm_names:
+                start_name = self.node_name_map[prm_names[0].lower()]
+                goal_name = self.node_name_map[prm_names[1].lower()]
+                path, stats = prm_query(self.file_path, self.nodes_dict, start_name, goal_name, Node,
+                                        collision_checker=self.collision_checker)
+                path = path or []
+                tree = path
+            elif reuse_tree:
+                bounds = bounds_for_nodes(self.nodes_dict.values())
+                key = tree_key("rrt", start, bounds, 3.0)
+                path, tree, stats = rrt(start, goal, return_stats=True, collision_checker=self.collision_checker,
+                                        progress_callback=progress, cancel_event=self.cancel_event,
+                                        tree=self.tree_cache.get(key), bounds=bounds)
+                self.tree_cache.put(key, tree)
+            else:
+                path, tree, stats = rrt(start, goal, return_stats=True, collision_checker=self.collision_checker,
+                                        progress_callback=progress, cancel_event=self.cancel_event)
+            pp_stats = []
+            if path and goal_reached(path) and (shortcut or smooth):
+                path, pp_stats = post_process(path, self.collision_checker, shortcut=shortcut, smooth=smooth)
+            result_queue.put(("done", (path, tree, stats, pp_stats)))
+        except Exception as e:
+            result_queue.put(("error", str(e)))
+
+    def poll_worker(self, start, goal, start_name, goal_name):
+        try:
+            while True:
+                kind, payload = self.result_queue.get_nowait()
+                if kind == "progress":
+                    iteration, tree_size, best_cost = payload
+                    cost_text = f"{best_cost:.2f}" if best_cost != float('inf') else "-"
+                    self.progress_label.config(
+                        text=f"Iteração {iteration} | Nós na árvore: {tree_size} | Melhor custo: {cost_text}")
+                elif kind == "done":
+                    self.finish_rrt(payload, start, goal, start_name, goal_name)
+                    return
+                else:
+                    self.finish_rrt(None, start, goal, start_name, goal_name)
+                    messagebox.showerror("Erro", f"Falha no planeamento: {payload}")
+                    return
+        except queue.Empty:
+            pass
+        self.master.after(100, self.poll_worker, start, goal, start_name, goal_name)
+
+    def cancel_rrt(self):
+        self.cancel_event.set()
+        self.progress_label.config(text="A cancelar...")
+
+    def finish_rrt(self, result, start, goal, start_name, goal_name):
+        self.run_button.config(state="normal")
+        self.load_button.config(state="normal")
+        self.cancel_button.config(state="disabled")
+        if result is None:
+            return
 
-        path, tree, stats = rrt(start, goal, return_stats=True)
+        path, tree, stats, pp_stats = result
+        if self.cancel_event.is_set():
+            self.progress_label.config(text="Planeamento cancelado.")
 
-        if path:
+        if path and goal_reached(path):
             self.stats_text.insert(tk.END, "\ncaminho encontrado!\n\n")
             for line in stats:
                 self.stats_text.insert(tk.END, line + "\n")
+            if pp_stats:
+                self.stats_text.insert(tk.END, "\nPós-processamento:\n")
+                for line in pp_stats:
+                    self.stats_text.insert(tk.END, line + "\n")
             plot_result(tree, path, start, goal, start_name, goal_name)
         else:
             self.stats_text.insert(tk.END, "\nNenhum caminho encontrado.")
 
-
 if __name__ == "__main__":
     root = tk.Tk()
     app = RRTApp(root)
@@ -1,12 +1,16 @@
 #https://github.com/zhm-real/PathPlanning/blob/master/Sampling_based_Planning/rrt_2D/rrt_star.py
 import csv
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 import numpy as np
 import math
 import time
 import os
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
+from obstaculos import load_collision_checker
+from pos_processamento import post_process
+from cache_arvores import TreeCache, bounds_for_nodes, tree_key
 
 class Node:
     def __init__(self, x, y, z=0, name=None):
@@ -68,32 +72,135 @@ def steer(from_node, to_node, step_size):
         scale = step_size / dist
         return Node(from_node.x + dx * scale, from_node.y + dy * scale, from_node.z + dz * scale)
 
-def rrt_star(start_coords, goal_coords, max_iter=500, step_size=1.0, goal_sample_rate=0.2):
+def extract_path(goal_node):
+    path = []
+    current = goal_node
+    while current:
+        path.append(current)
+        current = current.parent
+    return path[::-1]
+
+def prune_tree(tree, goal_node, best_cost, max_nodes=None, shared=False):
+    # Branch-and-bound: um nó cujo custo até ele mais a distância em linha reta ao objetivo
+    # excede a melhor solução nunca pode melhorá-la, e pela desigualdade triangular o mesmo
+    # vale para toda a sua subárvore. Com max_nodes removem-se ainda as folhas com pior
+    # custo estimado (nunca a raiz nem o melhor caminho) até caber no limite; numa árvore
+    # partilhada entre destinos (shared) o critério é só o custo desde a raiz.
+    # O rewire não propaga a descida de custo à subárvore do nó religado, por isso o
+    # custo até cada nó é recalculado durante a travessia a partir da raiz.
+    root = tree[0]
+    protected = set(map(id, extract_path(goal_node))) if goal_node.parent else set()
+    protected.add(id(root))
+    # Tolerância para os nós do caminho colineares com o objetivo (erro de arredondamento)
+    bound = best_cost + 1e-9
+    kept = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        kept.append(node)
+        survivors = []
+        for child in node.children:
+            child.cost = node.cost + distance(node, child)
+            if id(child) not in protected and child.cost + distance(child, goal_node) > bound:
+                child.parent = None
+            else:
+                survivors.append(child)
+                stack.append(child)
+        node.children = survivors
+
+    if max_nodes is not None and len(kept) > max_nodes:
+        removed = set()
+        while len(kept) - len(removed) > max_nodes:
+            leaves = [node for node in kept
+                      if not node.children and id(node) not in protected and id(node) not in removed]
+            if not leaves:
+                break
+            if shared:
+                leaves.sort(key=lambda node: node.cost, reverse=True)
+            else:
+                leaves.sort(key=lambda node: node.cost + distance(node, goal_node), reverse=True)
+            for leaf in leaves[:len(kept) - len(removed) - max_nodes]:
+                leaf.parent.children.remove(leaf)
+                leaf.parent = None
+                removed.add(id(leaf))
+        kept = [node for node in kept if id(node) not in removed]
+
+    return kept
+
+def rrt_star(start_coords, goal_coords, max_iter=500, step_size=1.0, goal_sample_rate=0.2,
+             time_limit_ms=None, patience=500, min_improvement=0.0, on_solution=None,
+             collision_checker=None, profiler=None, prune=False, max_nodes=None, tree=None, bounds=None,
+             shared_tree=False):
+    # time_limit_ms: orçamento de tempo (ms); ao expirar devolve a melhor solução até ao momento
+    # patience / min_improvement: para quando passam `patience` iterações sem uma melhoria
+    #   de custo superior a `min_improvement`
+    # on_solution(path, cost, iteration): chamado a cada solução melhorada (modo anytime)
+    # collision_checker: obstaculos.CollisionChecker; None = espaço livre
+    # profiler: instrumentacao.Profiler para tempos por fase e contadores; None = desligado
+    # prune: poda branch-and-bound a cada solução melhorada; max_nodes: limite rígido de nós
+    #   (ao ser excedido a árvore é cortada para 90% do limite, para não cortar a cada iteração)
+    # tree: árvore de uma consulta anterior com a mesma origem
+    # shared_tree: a árvore fica guardada para outros destinos (cache_arvores): desliga a poda,
+    #   que é relativa ao objetivo atual, e o limite de nós corta as folhas mais afastadas da
+    #   origem. Uma árvore reutilizada pode já ligar ao objetivo na iteração 0, por isso convém
+    #   usar uma patience bem menor que max_iter para terminar cedo nesse caso.
+    # bounds: ((xmin, xmax), (ymin, ymax), (zmin, zmax)) de amostragem; por omissão ±50 à volta
+    #   de origem e destino (para reutilizar árvores os limites têm de ser fixos, ver cache_arvores)
     start_time = time.time()
-    start_node = Node(*start_coords, name="Start")
-    start_node.cost = 0
+    deadline = start_time + time_limit_ms / 1000.0 if time_limit_ms is not None else None
     goal_node = Node(*goal_coords, name="Goal")
 
-    tree = [start_node]
-    explored_nodes = []
+    if shared_tree:
+        prune = False
+    if tree is None:
+        start_node = Node(*start_coords, name="Start")
+        start_node.cost = 0
+        tree = [start_node]
+    reused_nodes = len(tree) - 1
     last_improvement = 0
+    pruned_nodes = 0
 
-    x_range = (min(start_coords[0], goal_coords[0])-50, max(start_coords[0], goal_coords[0])+50)
-    y_range = (min(start_coords[1], goal_coords[1])-50, max(start_coords[1], goal_coords[1])+50)
-    z_range = (min(start_coords[2], goal_coords[2])-50, max(start_coords[2], goal_coords[2])+50)
+    if collision_checker:
+        collision_checker.reset_counters()
+
+    def segment_free(a, b):
+        if not collision_checker:
+            return True
+        return collision_checker.segment_free((a.x, a.y, a.z), (b.x, b.y, b.z))
+
+    if bounds is None:
+        bounds = tuple((min(start_coords[i], goal_coords[i])-50, max(start_coords[i], goal_coords[i])+50)
+                       for i in range(3))
+    x_range, y_range, z_range = bounds
 
     best_goal_node = None
     best_goal_cost = float('inf')
 
+    # Árvore reutilizada: a melhor ligação ao objetivo a partir dos nós existentes é a solução inicial
+    for node in tree if reused_nodes else []:
+        if distance(node, goal_node) < step_size * 2.0:
+            potential_goal_cost = node.cost + distance(node, goal_node)
+            if potential_goal_cost < best_goal_cost and segment_free(node, goal_node):
+                goal_node.parent = node
+                goal_node.cost = potential_goal_cost
+                best_goal_node = goal_node
+                best_goal_cost = potential_goal_cost
+    if best_goal_node and on_solution:
+        on_solution(extract_path(best_goal_node), best_goal_cost, 0)
+
     for iteration in range(max_iter):
+        if deadline is not None and time.time() >= deadline:
+            break
+        if best_goal_node and (iteration - last_improvement) > patience:
+            break
+        if profiler:
+            profiler.count("iterations")
+            t = profiler.start()
+
         if best_goal_node and iteration > max_iter * 0.7:
             rand_node = goal_node
         elif best_goal_node and np.random.random() < 0.1:
-            path_nodes = []
-            current = best_goal_node
-            while current:
-                path_nodes.append(current)
-                current = current.parent
+            path_nodes = extract_path(best_goal_node)
             selected_node = np.random.choice(path_nodes)
             rand_x = selected_node.x + np.random.normal(0, step_size/2)
             rand_y = selected_node.y + np.random.normal(0, step_size/2)
@@ -106,22 +213,42 @@ def rrt_star(start_coords, goal_coords, max_iter=500, step_size=1.0, goal_sample
             rand_y = np.random.uniform(y_range[0], y_range[1])
             rand_z = np.random.uniform(z_range[0], z_range[1])
             rand_node = Node(rand_x, rand_y, rand_z)
+        if profiler:
+            t = profiler.lap("sampling", t)
 
         nearest = min(tree, key=lambda node: distance(node, rand_node))
         new_node = steer(nearest, rand_node, step_size)
+        if profiler:
+            t = profiler.lap("nearest", t)
+
+        duplicate = any(distance(node, new_node) < step_size/10 for node in tree)
+        if profiler:
+            t = profiler.lap("duplicate_check", t)
+        if duplicate:
+            if profiler:
+                profiler.count("rejected_samples")
+            continue
 
-        if any(distance(node, new_node) < step_size/10 for node in tree):
+        free = segment_free(nearest, new_node)
+        if profiler:
+            t = profiler.lap("collision", t)
+        if not free:
+            if profiler:
+                profiler.count("collision_rejections")
             continue
 
         neighbor_radius = min(15.0 * math.sqrt(math.log(len(tree)+1) / (len(tree)+1)), step_size * 5)
         neighbors = [node for node in tree if distance(node, new_node) < neighbor_radius]
+        if profiler:
+            t = profiler.lap("neighbors", t)
+            profiler.count("neighbors_found", len(neighbors))
 
         min_cost = nearest.cost + distance(nearest, new_node)
         best_parent = nearest
 
         for neighbor in neighbors:
             potential_cost = neighbor.cost + distance(neighbor, new_node)
-            if potential_cost < min_cost:
+            if potential_cost < min_cost and segment_free(neighbor, new_node):
                 min_cost = potential_cost
                 best_parent = neighbor
 
@@ -129,37 +256,58 @@ def rrt_star(start_coords, goal_coords, max_iter=500, step_size=1.0, goal_sample
         new_node.cost = min_cost
         best_parent.children.append(new_node)
         tree.append(new_node)
-        explored_nodes.append((new_node.x, new_node.y))
+        if profiler:
+            t = profiler.lap("choose_parent", t)
+            profiler.count("nodes_expanded")
 
         for neighbor in neighbors:
             if neighbor != best_parent:
                 potential_cost = new_node.cost + distance(new_node, neighbor)
-                if potential_cost < neighbor.cost:
+                if potential_cost < neighbor.cost and segment_free(new_node, neighbor):
                     if neighbor.parent:
                         neighbor.parent.children.remove(neighbor)
                     neighbor.parent = new_node
                     neighbor.cost = potential_cost
                     new_node.children.append(neighbor)
+                    if profiler:
+                        profiler.count("rewires")
+        if profiler:
+            t = profiler.lap("rewire", t)
 
+        improved = False
         if distance(new_node, goal_node) < step_size * 2.0:
             potential_goal_cost = new_node.cost + distance(new_node, goal_node)
-            if potential_goal_cost < best_goal_cost:
+            if potential_goal_cost < best_goal_cost and segment_free(new_node, goal_node):
+                if best_goal_cost - potential_goal_cost > min_improvement:
+                    last_improvement = iteration
                 goal_node.parent = new_node
                 goal_node.cost = potential_goal_cost
                 best_goal_node = goal_node
                 best_goal_cost = potential_goal_cost
-                last_improvement = iteration
-
-            if (iteration - last_improvement) > 500 and best_goal_node:
-                break
+                improved = True
+                if on_solution:
+                    on_solution(extract_path(best_goal_node), best_goal_cost, iteration)
+                if profiler:
+                    profiler.count("improvements")
+        if profiler:
+            t = profiler.lap("goal_check", t)
+
+        if (prune and improved) or (max_nodes is not None and len(tree) > max_nodes):
+            size = len(tree)
+            target = int(max_nodes * 0.9) if max_nodes is not None and size > max_nodes else max_nodes
+            tree = prune_tree(tree, goal_node, best_goal_cost if prune else float('inf'), target, shared_tree)
+            pruned_nodes += size - len(tree)
+            if profiler:
+                profiler.lap("prune", t)
+                profiler.count("pruned_nodes", size - len(tree))
+
+    if profiler:
+        t = profiler.start()
+
+    explored_nodes = [(node.x, node.y) for node in tree]
 
     if best_goal_node:
-        path = []
-        current = best_goal_node
-        while current:
-            path.append(current)
-            current = current.parent
-        path.reverse()
+        path = extract_path(best_goal_node)
 
         execution_time = time.time() - start_time
 
@@ -184,19 +332,42 @@ def rrt_star(start_coords, goal_coords, max_iter=500, step_size=1.0, goal_sample
         stats = [
             f"Tempo de execução: {execution_time:.4f} segundos",
             f"Nós no caminho: {len(path)}",
-            f"Nós totais gerados: {len(tree)}",
+            f"Nós totais gerados: {len(tree) + pruned_nodes}",
+            f"Nós podados: {pruned_nodes} (na árvore: {len(tree)})",
+            f"Nós reutilizados de consultas anteriores: {reused_nodes}",
             f"Comprimento total (euclidiano): {total_length:.2f}",
             f"Custo total ponderado: {custo_ponderado:.2f} ",
             f" - Portagem total: {delta_x* 2:.2f}  (peso = {peso_x})",
             f" - Distancia total: {delta_y:.2f}  (peso = {peso_y})",
             f" - Gasolina total: {delta_z:.2f}  (peso = {peso_z})"
         ]
+        if collision_checker:
+            stats.extend(collision_checker.stats())
+        if profiler:
+            profiler.lap("stats", t)
+            stats.extend(profiler.stats())
+            profiler.finish()
 
         return path, tree, explored_nodes, stats
     else:
-        return None, tree, explored_nodes, ["Nenhum caminho encontrado."]
-
-def plot_result(tree, path, explored_nodes, start, goal, start_name, goal_name):
+        stats = ["Nenhum caminho encontrado."]
+        if profiler:
+            stats.extend(profiler.stats())
+            profiler.finish()
+        return None, tree, explored_nodes, stats
+
+def tree_segments(tree, max_edges=None):
+    segments = np.array([((node.x, node.y), (node.parent.x, node.parent.y))
+                         for node in tree if node.parent], dtype=float).reshape(-1, 2, 2)
+    # Árvores grandes: amostra reprodutível das arestas (nível de detalhe)
+    if max_edges is not None and len(segments) > max_edges:
+        keep = np.random.default_rng(0).choice(len(segments), size=max_edges, replace=False)
+        segments = segments[np.sort(keep)]
+    return segments
+
+def plot_result(tree, path, explored_nodes, start, goal, start_name, goal_name, max_edges=5000,
+                output_file=None):
+    # output_file: grava a figura em ficheiro (sem janela) em vez de a mostrar
     fig, ax = plt.subplots(figsize=(10, 10))
 
     # 1. Nós explorados com transparência
@@ -204,10 +375,11 @@ def plot_result(tree, path, explored_nodes, start, goal, start_name, goal_name):
         ex_x, ex_y = zip(*explored_nodes)
         ax.scatter(ex_x, ex_y, color='gray', s=8, alpha=0.1, label='Nós explorados')
 
-    # 2. Arestas da árvore (light blue)
-    for node in tree:
-        if node.parent:
-            ax.plot([node.x, node.parent.x], [node.y, node.parent.y], color='lightblue', linewidth=0.4)
+    # 2. Arestas da árvore (light blue), todas num único artista
+    segments = tree_segments(tree, max_edges)
+    if len(segments):
+        ax.add_collection(LineCollection(segments, colors='lightblue', linewidths=0.4))
+        ax.autoscale_view()
 
     # 3. Caminho final em vermelho destacado
     if path:
@@ -230,9 +402,14 @@ def plot_result(tree, path, explored_nodes, start, goal, start_name, goal_name):
     ax.set_ylabel("Y")
     ax.legend()
     ax.grid(True)
-    plt.axis('equal')
-    plt.tight_layout()
-    plt.show()
+    ax.axis('equal')
+    fig.tight_layout()
+
+    if output_file:
+        fig.savefig(output_file)
+        plt.close(fig)
+    else:
+        plt.show()
 
 class RRTStarApp:
     def __init__(self, master):
@@ -242,6 +419,8 @@ class RRTStarApp:
         self.master.configure(bg="#f4f4f4")
         self.nodes_dict = {}
         self.node_name_map = {}
+        self.collision_checker = None
+        self.tree_cache = TreeCache(capacity=8)
         self.create_widgets()
 
     def create_widgets(self):
@@ -278,6 +457,24 @@ class RRTStarApp:
         self.goal_combobox = ttk.Combobox(main_frame, state="readonly", font=style_font, width=30)
         self.goal_combobox.grid(row=2, column=1, pady=5)
 
+        # === Pós-processamento do caminho ===
+        self.shortcut_var = tk.BooleanVar(value=False)
+        self.smooth_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(main_frame, text="Encurtar caminho (atalhos)", variable=self.shortcut_var, font=style_font,
+                       bg="#f4f4f4").grid(row=3, column=0, columnspan=2, sticky="w")
+        tk.Checkbutton(main_frame, text="Suavizar caminho (spline)", variable=self.smooth_var, font=style_font,
+                       bg="#f4f4f4").grid(row=4, column=0, columnspan=2, sticky="w")
+
+        # === Poda branch-and-bound da árvore ===
+        self.prune_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(main_frame, text="Podar árvore (branch-and-bound)", variable=self.prune_var, font=style_font,
+                       bg="#f4f4f4").grid(row=5, column=0, columnspan=2, sticky="w")
+
+        # === Reutilização da árvore entre consultas com a mesma origem ===
+        self.reuse_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(main_frame, text="Reutilizar árvore da mesma origem", variable=self.reuse_var, font=style_font,
+                       bg="#f4f4f4").grid(row=6, column=0, columnspan=2, sticky="w")
+
         # === Botão Executar ===
         self.run_button = tk.Button(self.master, text="▶Executar RRT*", command=self.run_rrt_star,
                                     font=("Segoe UI", 12, "bold"), bg="#27ae60", fg="white", relief="flat", padx=12,
@@ -303,8 +500,14 @@ class RRTStarApp:
                 nomes = list(nodes.keys())
                 self.start_combobox["values"] = nomes
                 self.goal_combobox["values"] = nomes
+                # Obstáculos opcionais em <nome>_obstaculos.csv
+                self.collision_checker = load_collision_checker(file_path)
+                self.tree_cache.clear()
+                obstaculos_info = ""
+                if self.collision_checker:
+                    obstaculos_info = f" ({len(self.collision_checker.obstacles)} obstáculos)"
                 filename = os.path.basename(file_path)
-                self.current_file_label.config(text=f"📄 Ficheiro carregado: {filename}", fg="#2c3e50")
+                self.current_file_label.config(text=f"📄 Ficheiro carregado: {filename}{obstaculos_info}", fg="#2c3e50")
                 messagebox.showinfo("Sucesso", f"{len(nomes)} nós carregados com sucesso.")
             else:
                 messagebox.showerror("Erro", "Erro ao carregar CSV.")
@@ -325,10 +528,28 @@ class RRTStarApp:
             messagebox.showerror("Erro", "Nó de origem ou destino inválido.")
             return
 
-        path, tree, explored, stats = rrt_star(start, goal)
+        if self.reuse_var.get():
+            # Árvore partilhada: sem poda relativa ao destino, limite de nós para a memória e
+            # patience curta para terminar cedo quando a árvore guardada já liga ao destino
+            bounds = bounds_for_nodes(self.nodes_dict.values())
+            key = tree_key("rrt_star", start, bounds, 1.0)
+            path, tree, explored, stats = rrt_star(start, goal, collision_checker=self.collision_checker,
+                                                   tree=self.tree_cache.get(key), bounds=bounds, max_nodes=5000,
+                                                   patience=50, shared_tree=True)
+            self.tree_cache.put(key, tree)
+        else:
+            path, tree, explored, stats = rrt_star(start, goal, collision_checker=self.collision_checker,
+                                                   prune=self.prune_var.get(), max_nodes=5000)
         for line in stats:
             self.stats_text.insert(tk.END, line + "\n")
 
+        if path and (self.shortcut_var.get() or self.smooth_var.get()):
+            path, pp_stats = post_process(path, self.collision_checker, shortcut=self.shortcut_var.get(),
+                                          smooth=self.smooth_var.get())
+            self.stats_text.insert(tk.END, "\nPós-processamento:\n")
+            for line in pp_stats:
+                self.stats_text.insert(tk.END, line + "\n")
+
         if path:
             plot_result(tree, path, explored, start, goal, start_name, goal_name)
 
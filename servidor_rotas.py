@@ -0,0 +1,299 @@
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from matriz_adjacencia_grafo import (csv_para_grafo, normalizar_nome_cidade, a_star_melhor_caminho,
+                                     k_melhores_caminhos, alcance_com_orcamento, caminho_por_predecessores,
+                                     totais_caminho)
+
+
+### === SERVIDOR DE ROTAS (ASYNCIO) COM O GRAFO EM MEMÓRIA === ###
+#
+# GET  /rota?origem=Berlin&destino=Madrid[&k=3]   melhor rota (ou k alternativas)
+# POST /lote  [{"origem": .., "destino": .., "k": ..}, ...]   várias rotas num só pedido
+# GET  /alcance?origem=..&orcamento=..[&criterio=combustivel]  nós alcançáveis dentro do orçamento
+# GET  /rrt?origem=..&destino=..[&tempo_ms=200]  RRT sobre os nós do CSV (--rrt)
+# GET  /metricas                                  latência e débito do servidor
+
+PESOS_POR_OMISSAO = {"distancia": 2, "combustivel": 1, "portagem": 0.5}
+# O custo do Yen cresce mais do que linearmente com k: um k enorme prenderia uma thread do pool
+K_MAXIMO = 50
+
+
+class MetricasServidor:
+    def __init__(self, janela=10000):
+        self.inicio = time.time()
+        self.pedidos = 0
+        self.erros = 0
+        self.rotas_calculadas = 0
+        self.em_curso = 0
+        self.latencias_ms = deque(maxlen=janela)
+
+    def registar(self, latencia_ms, erro=False, rotas=0):
+        self.pedidos += 1
+        self.rotas_calculadas += rotas
+        if erro:
+            self.erros += 1
+        self.latencias_ms.append(latencia_ms)
+
+    def percentil(self, p):
+        if not self.latencias_ms:
+            return 0.0
+        ordenadas = sorted(self.latencias_ms)
+        return ordenadas[min(len(ordenadas) - 1, int(p / 100.0 * len(ordenadas)))]
+
+    def to_dict(self):
+        decorrido = max(time.time() - self.inicio, 1e-9)
+        return {
+            "pedidos": self.pedidos,
+            "erros": self.erros,
+            "rotas_calculadas": self.rotas_calculadas,
+            "em_curso": self.em_curso,
+            "tempo_ativo_s": round(decorrido, 3),
+            "debito_pedidos_s": round(self.pedidos / decorrido, 3),
+            "debito_rotas_s": round(self.rotas_calculadas / decorrido, 3),
+            "latencia_ms": {
+                "p50": round(self.percentil(50), 3),
+                "p95": round(self.percentil(95), 3),
+                "p99": round(self.percentil(99), 3),
+                "max": round(max(self.latencias_ms, default=0.0), 3)
+            }
+        }
+
+
+class ErroPedido(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+
+def ler_numero(pedido, chave, omissao, tipo=float, minimo=None, maximo=None):
+    # Parâmetros numéricos do pedido; valores inválidos dão 400 em vez de um erro interno
+    valor = pedido.get(chave, omissao)
+    try:
+        if isinstance(valor, bool):
+            raise ValueError
+        numero = tipo(valor)
+        if tipo is int and isinstance(valor, float) and valor != numero:
+            raise ValueError
+    except (TypeError, ValueError, OverflowError):
+        raise ErroPedido(400, f"Parâmetro '{chave}' inválido: {valor!r}")
+    if not math.isfinite(numero) or (minimo is not None and numero < minimo):
+        raise ErroPedido(400, f"Parâmetro '{chave}' inválido: {valor!r}")
+    if maximo is not None and numero > maximo:
+        raise ErroPedido(400, f"Parâmetro '{chave}' acima do máximo ({maximo}): {valor!r}")
+    return numero
+
+
+class ServidorRotas:
+    def __init__(self, nome_arquivo, pesos=None, arquivo_rrt=None, max_workers=4):
+        self.pesos = pesos or PESOS_POR_OMISSAO
+        # Os CSV são lidos uma única vez, no arranque
+        self.grafo, _, self.coordenadas = csv_para_grafo(nome_arquivo, self.pesos)
+        self.nos_rrt = self.mapa_rrt = self.colisoes_rrt = None
+        if arquivo_rrt:
+            from rrt_adaptado import load_csv
+            from obstaculos import load_collision_checker
+            self.nos_rrt, self.mapa_rrt, _ = load_csv(arquivo_rrt)
+            # As mesmas zonas de exclusão que as interfaces gráficas respeitam
+            self.colisoes_rrt = load_collision_checker(arquivo_rrt)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.metricas = MetricasServidor()
+
+    ### --- Cálculo (corre no pool de threads) --- ###
+
+    def calcular_rota(self, pedido):
+        origem = normalizar_nome_cidade(str(pedido.get("origem", "")))
+        destino = normalizar_nome_cidade(str(pedido.get("destino", "")))
+        if origem not in self.grafo or destino not in self.grafo:
+            return {"origem": origem, "destino": destino, "erro": "Origem ou destino inexistente."}
+
+        k = ler_numero(pedido, "k", 1, int, minimo=1, maximo=K_MAXIMO)
+        if k > 1:
+            rotas = k_melhores_caminhos(self.grafo, origem, destino, k)
+        else:
+            caminho, custo, detalhes = a_star_melhor_caminho(self.grafo, origem, destino, self.coordenadas)
+            # Mesmo formato que as rotas do k_melhores_caminhos
+            rotas = ([{"caminho": caminho, "custo": custo, "detalhes": detalhes, "totais": totais_caminho(detalhes)}]
+                     if caminho else [])
+        return {"origem": origem, "destino": destino, "rotas": rotas}
+
+    def calcular_alcance(self, pedido):
+        origem = normalizar_nome_cidade(str(pedido.get("origem", "")))
+        criterio = pedido.get("criterio", "weight")
+        if origem not in self.grafo:
+            return {"origem": origem, "erro": "Origem inexistente."}
+        if criterio not in ("weight", "distancia", "combustivel", "portagem"):
+            return {"origem": origem, "erro": f"Critério inválido: {criterio}"}
+
+        orcamento = ler_numero(pedido, "orcamento", 0, minimo=0)
+        custos, predecessores = alcance_com_orcamento(self.grafo, origem, orcamento, criterio)
+        alcancaveis = [
+            {"no": no, "custo": custo, "caminho": caminho_por_predecessores(predecessores, no)}
+            for no, custo in sorted(custos.items(), key=lambda item: item[1])
+        ]
+        return {"origem": origem, "criterio": criterio, "alcancaveis": alcancaveis, "predecessores": predecessores}
+
+    def calcular_lote(self, pedidos):
+        # Um pedido inválido só falha o seu próprio item, não o lote inteiro
+        resultados = []
+        for pedido in pedidos:
+            if not isinstance(pedido, dict):
+                resultados.append({"erro": "Cada pedido do lote deve ser um objeto JSON."})
+                continue
+            try:
+                resultados.append(self.calcular_rota(pedido))
+            except ErroPedido as e:
+                resultados.append({"erro": e.mensagem})
+        return resultados
+
+    def calcular_rrt(self, pedido):
+        from rrt_adaptado import rrt, find_node_case_insensitive, goal_reached
+        start = find_node_case_insensitive(self.nos_rrt, self.mapa_rrt, str(pedido.get("origem", "")))
+        goal = find_node_case_insensitive(self.nos_rrt, self.mapa_rrt, str(pedido.get("destino", "")))
+        if not start or not goal:
+            return {"erro": "Nó de origem ou destino inválido."}
+
+        tempo_ms = ler_numero(pedido, "tempo_ms", 200, minimo=0)
+        # Contadores de colisão por pedido: o rrt() faz reset_counters() e as threads correm em paralelo
+        colisoes = self.colisoes_rrt.view() if self.colisoes_rrt else None
+        path, _, stats = rrt(start, goal, return_stats=True, time_limit_ms=tempo_ms, collision_checker=colisoes)
+        if not goal_reached(path):
+            return {"caminho": None, "estatisticas": stats}
+        return {"caminho": [(node.x, node.y, node.z) for node in path], "estatisticas": stats}
+
+    ### --- HTTP --- ###
+
+    async def despachar(self, metodo, alvo, corpo):
+        url = urlsplit(alvo)
+        query = {chave: valores[-1] for chave, valores in parse_qs(url.query).items()}
+        loop = asyncio.get_running_loop()
+
+        if metodo == "GET" and url.path == "/metricas":
+            return 200, self.metricas.to_dict(), 0
+        if metodo == "GET" and url.path == "/rota":
+            resultado = await loop.run_in_executor(self.executor, self.calcular_rota, query)
+            return (404, resultado, 0) if "erro" in resultado else (200, resultado, 1 if resultado["rotas"] else 0)
+        if metodo == "GET" and url.path == "/alcance":
+            resultado = await loop.run_in_executor(self.executor, self.calcular_alcance, query)
+            return (404, resultado, 0) if "erro" in resultado else (200, resultado, 1)
+        if metodo == "POST" and url.path == "/lote":
+            try:
+                pedidos = json.loads(corpo or b"[]")
+            except json.JSONDecodeError:
+                raise ErroPedido(400, "Corpo JSON inválido.")
+            if not isinstance(pedidos, list):
+                raise ErroPedido(400, "O lote deve ser uma lista de pedidos.")
+            resultados = await loop.run_in_executor(self.executor, self.calcular_lote, pedidos)
+            return 200, resultados, sum(1 for r in resultados if r.get("rotas"))
+        if metodo == "GET" and url.path == "/rrt":
+            if not self.nos_rrt:
+                raise ErroPedido(404, "Servidor iniciado sem ficheiro de nós RRT (--rrt).")
+            resultado = await loop.run_in_executor(self.executor, self.calcular_rrt, query)
+            return (404, resultado, 0) if "erro" in resultado else (200, resultado, 0 if resultado["caminho"] is None else 1)
+        raise ErroPedido(404, f"Recurso desconhecido: {metodo} {url.path}")
+
+    async def tratar_ligacao(self, reader, writer):
+        try:
+            while True:
+                linha = await reader.readline()
+                if not linha:
+                    break
+                try:
+                    metodo, alvo, versao = linha.decode("latin-1").split()
+                except ValueError:
+                    break
+
+                cabecalhos = {}
+                while True:
+                    cabecalho = await reader.readline()
+                    if cabecalho in (b"\r\n", b"\n", b""):
+                        break
+                    nome, _, valor = cabecalho.decode("latin-1").partition(":")
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+
+                try:
+                    tamanho = int(cabecalhos.get("content-length", 0) or 0)
+                except ValueError:
+                    tamanho = -1
+                # Sem um Content-Length válido não se sabe onde acaba o corpo: responde e fecha
+                corpo = await reader.readexactly(tamanho) if tamanho > 0 else b""
+
+                inicio = time.perf_counter()
+                self.metricas.em_curso += 1
+                rotas = 0
+                try:
+                    if tamanho < 0:
+                        raise ErroPedido(400, "Cabeçalho Content-Length inválido.")
+                    status, resposta, rotas = await self.despachar(metodo.upper(), alvo, corpo)
+                except ErroPedido as e:
+                    status, resposta = e.status, {"erro": e.mensagem}
+                except Exception as e:
+                    status, resposta = 500, {"erro": str(e)}
+                finally:
+                    self.metricas.em_curso -= 1
+                self.metricas.registar((time.perf_counter() - inicio) * 1000.0, erro=status >= 400, rotas=rotas)
+
+                manter = (versao == "HTTP/1.1" and cabecalhos.get("connection", "").lower() != "close"
+                          and tamanho >= 0)
+                dados = json.dumps(resposta, ensure_ascii=False, default=float).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status < 400 else 'Erro'}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(dados)}\r\n"
+                    f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n".encode("latin-1") + dados
+                )
+                await writer.drain()
+                if not manter:
+                    break
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def iniciar(self, host="127.0.0.1", porta=8080, unix=None):
+        if unix:
+            servidor = await asyncio.start_unix_server(self.tratar_ligacao, path=unix)
+            print(f"Servidor de rotas a escutar em unix:{unix}")
+        else:
+            servidor = await asyncio.start_server(self.tratar_ligacao, host, porta)
+            print(f"Servidor de rotas a escutar em http://{host}:{porta}")
+        return servidor
+
+    async def servir(self, host="127.0.0.1", porta=8080, unix=None):
+        servidor = await self.iniciar(host, porta, unix)
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            self.executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor de rotas com o grafo em memória.")
+    parser.add_argument("arquivo", help="CSV do grafo (origem,destino,distancia,combustivel,portagem)")
+    parser.add_argument("--rrt", help="CSV de nós para o endpoint /rrt")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8080)
+    parser.add_argument("--unix", help="caminho de um socket Unix (em vez de TCP)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--prioridade", default="distancia,combustivel,portagem",
+                        help="critérios por ordem de importância, separados por vírgulas")
+    args = parser.parse_args()
+
+    prioridades = [c.strip() for c in args.prioridade.split(",")]
+    if sorted(prioridades) != sorted(PESOS_POR_OMISSAO):
+        parser.error("--prioridade deve conter distancia, combustivel e portagem")
+    pesos = {prioridades[0]: 2, prioridades[1]: 1, prioridades[2]: 0.5}
+
+    servidor = ServidorRotas(args.arquivo, pesos, args.rrt, args.workers)
+    try:
+        asyncio.run(servidor.servir(args.host, args.porta, args.unix))
+    except KeyboardInterrupt:
+        print("\nServidor terminado.")